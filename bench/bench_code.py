@@ -0,0 +1,62 @@
+# Benchmark for md_to_html.convert_stream() on very large fenced code blocks
+# Streams log dumps of several MB and reports the throughput and the peak memory of the conversion.
+
+# imports
+import argparse, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import md_to_html
+
+SIZES = (1, 10, 50)  # MB of code in the fence
+GROWTH_LIMIT = 1.5  # allowed ratio between the peak memory of the largest and the smallest fence
+
+def iter_fence(size: int, seed: int = 0):
+    """
+    Generates a fenced code block with log lines full of characters that must be escaped.
+    :param size: approximate size of the code in bytes
+    :param seed: seed of the random generator
+    :return: iterator of Markdown lines
+    """
+    rng = random.Random(seed)
+    yield "```log\n"
+    written = 0
+    while written < size:
+        line = (f"2024-05-{rng.randint(1, 31):02d} [{rng.choice(('INFO', 'WARN', 'ERROR'))}] "
+                f"<worker-{rng.randint(0, 63)}> request {rng.randint(0, 10**6)} & "
+                f"{rng.choice(('done', 'retry -> queue', 'failed: a < b', 'x = y > z'))}\n")
+        written += len(line)
+        yield line
+    yield "```\n"
+
+def measure(size: int) -> tuple:
+    """
+    Converts a fence twice: once for the time, and once with tracemalloc for the peak memory.
+    :param size: size of the code in bytes
+    :return: (seconds, peak traced memory in bytes, output length)
+    """
+    lines = list(iter_fence(size))  # generated beforehand, so only the conversion is timed
+    start = time.perf_counter()
+    output_size = sum(map(len, md_to_html.convert_stream(lines)))
+    seconds = time.perf_counter() - start
+    del lines
+    tracemalloc.start()
+    for _ in md_to_html.convert_stream(iter_fence(size)):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, output_size
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Streaming benchmark of very large code blocks')
+    parser.add_argument('sizes', nargs='*', type=int, default=SIZES, help='sizes of the code in MB')
+    args = parser.parse_args()
+
+    peaks = []
+    for megabytes in args.sizes:
+        seconds, peak, output_size = measure(megabytes * 1_000_000)
+        peaks.append(peak)
+        print(f"{megabytes:>5} MB  {seconds:6.2f} s  {megabytes / seconds:7.1f} MB/s  "
+              f"output {output_size / 1e6:6.1f} MB  peak {peak / 1e6:5.1f} MB")
+    if len(peaks) > 1 and max(peaks) > GROWTH_LIMIT * peaks[0]:
+        print(f"FAILED: peak memory grows with the size of the fence ({peaks[0] / 1e6:.1f} MB -> {max(peaks) / 1e6:.1f} MB)")
+        exit(1)
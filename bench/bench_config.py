@@ -0,0 +1,64 @@
+# Benchmark of the configured CSS classes (md_to_html_config.json)
+# Converts a large mixed document without a configuration and with a class on every element,
+# and measures the cost of checking a loaded configuration file for changes.
+
+# imports
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import corpus
+from md_to_html import converter
+
+OVERHEAD_LIMIT = 0.1  # allowed relative slowdown of a conversion with a class on every element
+REPEAT = 7
+
+def best_times(lines: list, tag_tables: list, repeat: int = REPEAT) -> list:
+    """
+    Converts the lines with every tag table in turn, so a change of the machine load affects all of them.
+    :param lines: Markdown lines
+    :param tag_tables: tag tables to compare
+    :param repeat: number of conversions with every table
+    :return: best time in seconds for every table
+    """
+    best = [float('inf')] * len(tag_tables)
+    for _ in range(repeat):
+        for index, tags in enumerate(tag_tables):
+            start = time.perf_counter()
+            converter.handle_conversion(lines, tags)
+            best[index] = min(best[index], time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the configured CSS classes')
+    parser.add_argument('--size', type=int, default=2 * 1024 * 1024, help='size of the document in bytes')
+    args = parser.parse_args()
+
+    lines = corpus.generate('mixed', args.size)
+    config = {'classes': {element: f"md-{element}" for element in converter.CONFIG_ELEMENTS}}
+    configured_tags = converter.config_tags(config)
+    elements = converter.handle_conversion(lines, configured_tags).count('class="md-')
+
+    plain, configured = best_times(lines, [converter.DEFAULT_TAGS, configured_tags])
+    overhead = configured / plain - 1
+    print(f"{elements} elements with a class")
+    print(f"no configuration:   {plain * 1000:8.1f} ms")
+    print(f"class on every tag: {configured * 1000:8.1f} ms  ({overhead:+.1%})")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, converter.CONFIG_PATH)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('{"classes": {"p": "lead", "table": "data"}}\n')
+        start = time.perf_counter()
+        converter.load_tags(path)
+        loaded = time.perf_counter() - start
+        checks = 10000
+        start = time.perf_counter()
+        for _ in range(checks):
+            converter.load_tags(path)
+        unchanged = (time.perf_counter() - start) / checks
+    print(f"configuration file: loaded in {loaded * 1e6:.0f} us, checked for changes in {unchanged * 1e6:.1f} us")
+
+    if overhead > OVERHEAD_LIMIT:
+        print(f"FAILED: the classes slow the conversion down by more than {OVERHEAD_LIMIT:.0%}")
+        exit(1)
@@ -0,0 +1,74 @@
+# Benchmark for the import time of the md_to_html package
+# Imports the package in fresh interpreters with python -X importtime and fails when the median import time
+# is over the budget, when a slow module that is only needed later is imported, or when the import leaves any file behind.
+#
+# Usage: python bench/bench_import.py [--budget MS] [--runs N]
+
+# imports
+import argparse, os, statistics, subprocess, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = 40.0  # default budget of the cumulative import time of md_to_html
+# Modules that must only be imported when they are used
+LAZY_MODULES = ('md_to_html.build', 'md_to_html.server', 'asyncio', 'concurrent.futures', 'hashlib', 'json', 'argparse',
+                'simple_logger', 'typing')
+
+def import_times(module: str, directory: str) -> dict:
+    """
+    Imports a module in a fresh interpreter and reads the import times.
+    :param module: name of the module to import
+    :param directory: working directory of the interpreter
+    :return: dictionary: module name -> (self time, cumulative time) in microseconds
+    """
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=directory,
+                            env=environment, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_time), int(cumulative))
+    return times
+
+def run(budget: float, runs: int) -> int:
+    """
+    Measures the import time and checks the budget.
+    :param budget: budget in milliseconds
+    :param runs: number of measured imports
+    :return: 0 - Success, 1 - Over the budget or side effects found
+    """
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        import_times('md_to_html', ROOT)  # warm-up, so the bytecode is cached
+        measurements = [import_times('md_to_html', directory) for _ in range(runs)]
+        main_measurements = [import_times('main', directory) for _ in range(runs)]
+        leftovers = os.listdir(directory)
+
+    package_ms = statistics.median(times['md_to_html'][1] for times in measurements) / 1000
+    main_ms = statistics.median(times['main'][1] for times in main_measurements) / 1000
+    print(f"import md_to_html: {package_ms:.1f} ms (budget {budget:.1f} ms)")
+    print(f"import main:       {main_ms:.1f} ms")
+    print("slowest modules (self time):")
+    slowest = sorted(measurements[-1].items(), key=lambda item: item[1][0], reverse=True)[:5]
+    for name, (self_time, _) in slowest:
+        print(f"  {name:<30} {self_time / 1000:>6.1f} ms")
+
+    if package_ms > budget:
+        print(f"FAILED: import time over the budget by {package_ms - budget:.1f} ms")
+        failed = True
+    eager = [name for name in LAZY_MODULES if any(name in times for times in measurements + main_measurements)]
+    if eager:
+        print(f"FAILED: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if leftovers:
+        print(f"FAILED: importing left files behind: {', '.join(leftovers)}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Import time benchmark of the md_to_html package')
+    parser.add_argument('--budget', type=float, default=BUDGET_MS, help='import time budget in milliseconds')
+    parser.add_argument('--runs', type=int, default=9, help='number of measured imports, the median is reported')
+    args = parser.parse_args()
+    exit(run(args.budget, args.runs))
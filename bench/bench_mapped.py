@@ -0,0 +1,85 @@
+# Benchmark for the memory-mapped input of md_to_html.convert_file()
+# Converts a generated document with readlines(), with the open file and with a memory map, each in a fresh
+# interpreter, and compares their peak resident memory. Fails when the mapped path uses much more memory than
+# the open file, more than its index of the lines can take.
+#
+# Usage: python bench/bench_mapped.py [SIZE_MB ...]
+
+# imports
+import argparse, os, subprocess, sys, tempfile, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+import corpus
+
+SIZES = (16, 64, 256)  # sizes of the document in MB
+INDEX_LIMIT = 0.25  # allowed memory of the mapped path over the open file, as a share of the file size (8 bytes per line)
+# Conversion run in a fresh interpreter for every path, so the peak memory of one doesn't hide the others
+CONVERT = """
+import resource, sys
+import md_to_html
+from md_to_html import converter
+path, output_path, mode = sys.argv[1:]
+if mode == 'readlines':
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = file.readlines()
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write(converter.handle_conversion(lines))
+else:
+    md_to_html.convert_file(path, output_path, mapped=mode == 'mapped')
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+MODES = ('readlines', 'stream', 'mapped')
+
+def write_document(path: str, size: int) -> None:
+    """
+    Writes a document of the mixed corpus, repeating one generated chunk up to the size.
+    :param path: path to the file
+    :param size: size of the file in bytes
+    :return: None
+    """
+    chunk = "".join(corpus.generate('mixed', 4 * 1024 * 1024))
+    with open(path, 'w', encoding='utf-8') as file:
+        for _ in range(-(-size // len(chunk))):
+            file.write(chunk)
+
+def measure(path: str, mode: str) -> tuple:
+    """
+    Converts a file in a fresh interpreter.
+    :param path: path to the Markdown file
+    :param mode: readlines, stream or mapped
+    :return: (seconds, peak resident memory in bytes)
+    """
+    environment = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CONVERT, path, path + '.html', mode], env=environment,
+                            capture_output=True, text=True, check=True)
+    seconds = time.perf_counter() - start
+    os.remove(path + '.html')
+    return seconds, int(result.stdout) * 1024  # ru_maxrss is in kB on Linux
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Peak memory of the memory-mapped input')
+    parser.add_argument('sizes', nargs='*', type=int, default=SIZES, help='sizes of the document in MB')
+    args = parser.parse_args()
+
+    if sys.platform == 'darwin' or os.name == 'nt':
+        print("The peak resident memory is only measured on Linux.")
+        exit(0)
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f'{size}.md')
+            write_document(path, size * 1024 * 1024)
+            peaks = {}
+            for mode in MODES:
+                seconds, peak = measure(path, mode)
+                peaks[mode] = peak
+                print(f"{size:>6} MB  {mode:<9}  {seconds:6.2f} s  {size / seconds:6.2f} MB/s  peak RSS {peak / 1e6:7.1f} MB")
+            os.remove(path)
+            if peaks['mapped'] - peaks['stream'] > INDEX_LIMIT * size * 1024 * 1024:
+                print(f"FAILED: the mapped path uses {(peaks['mapped'] - peaks['stream']) / 1e6:.1f} MB more than the open file")
+                failed = True
+    if failed:
+        exit(1)
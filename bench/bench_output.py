@@ -0,0 +1,69 @@
+# Benchmark for md_to_html.handle_conversion() on a large document
+# Measures the time and the peak memory of converting a ~10 MB document with nested blocks.
+
+# imports
+import os, resource, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import md_to_html
+
+SECTION = """# Release notes
+
+Paragraph with **bold**, _italic_, `code` and a [link](https://example.com).
+Second line of the same paragraph.
+
+> Quoted text
+>> Nested quote with ==highlight==
+
+- Item one
+- Item two
+  - Nested item
+    - Deeper item
+
+1. First
+2. Second
+
+| Key | Value |
+|:----|------:|
+| a | 1 |
+| b | 2 |
+
+```
+code line
+```
+
+---
+
+"""
+
+def build_document(size: int) -> list:
+    """
+    Builds a Markdown document of about the given size.
+    :param size: target size in bytes
+    :return: list of lines, as returned by readlines()
+    """
+    repeats = max(1, size // len(SECTION))
+    return (SECTION * repeats).splitlines(keepends=True)
+
+def measure(lines: list) -> tuple:
+    """
+    Converts the lines and measures the time and the growth of the peak resident memory during the conversion.
+    :param lines: Markdown lines
+    :return: (seconds, peak growth in bytes, output length)
+    """
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    output = md_to_html.handle_conversion(lines)
+    seconds = time.perf_counter() - start
+    peak_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, (peak_after - peak_before) * 1024, len(output)
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10 * 1024 * 1024
+    lines = build_document(size)
+    input_size = sum(len(line) for line in lines)
+    seconds, peak, output_size = measure(lines)
+    print(f"input:  {input_size / 1e6:.1f} MB, {len(lines)} lines")
+    print(f"output: {output_size / 1e6:.1f} MB")
+    print(f"time:   {seconds:.2f} s ({input_size / 1e6 / seconds:.2f} MB/s)")
+    print(f"peak:   +{peak / 1e6:.1f} MB RSS during the conversion")
@@ -0,0 +1,57 @@
+# Benchmark for md_to_html.convert_stream() on very large tables
+# Streams generated tables of growing length and checks that the peak memory doesn't grow with the number of rows.
+
+# imports
+import argparse, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import md_to_html
+
+SIZES = (10_000, 50_000, 200_000)  # number of rows
+GROWTH_LIMIT = 1.5  # allowed ratio between the peak memory of the longest and the shortest table
+
+def iter_table(rows: int, seed: int = 0):
+    """
+    Generates a data table, with plain cells and a few cells with markup or escaped pipes.
+    :param rows: number of rows
+    :param seed: seed of the random generator
+    :return: iterator of Markdown lines
+    """
+    rng = random.Random(seed)
+    yield "| Id | Name | Amount | Status | Note |\n"
+    yield "|---:|:-----|-------:|:------:|------|\n"
+    for i in range(rows):
+        status = rng.choice(("ok", "failed", "**late**", "`n/a`"))
+        note = rng.choice(("", "retry", "a \\| b", "see [docs](https://example.com)"))
+        yield f"| {i} | item-{rng.randint(0, 99999)} | {rng.randint(0, 10**6) / 100} | {status} | {note} |\n"
+
+def measure(rows: int) -> tuple:
+    """
+    Converts a table twice: once for the time, and once with tracemalloc for the peak memory.
+    :param rows: number of rows
+    :return: (seconds, peak traced memory in bytes, output length)
+    """
+    start = time.perf_counter()
+    output_size = sum(map(len, md_to_html.convert_stream(iter_table(rows))))
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    for _ in md_to_html.convert_stream(iter_table(rows)):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, output_size
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Streaming benchmark of very large tables')
+    parser.add_argument('sizes', nargs='*', type=int, default=SIZES, help='numbers of rows')
+    args = parser.parse_args()
+
+    peaks = []
+    for rows in args.sizes:
+        seconds, peak, output_size = measure(rows)
+        peaks.append(peak)
+        print(f"{rows:>9} rows  {seconds:6.2f} s  {rows / seconds:>9.0f} rows/s  "
+              f"output {output_size / 1e6:6.1f} MB  peak {peak / 1e6:5.1f} MB")
+    if len(peaks) > 1 and max(peaks) > GROWTH_LIMIT * peaks[0]:
+        print(f"FAILED: peak memory grows with the number of rows ({peaks[0] / 1e6:.1f} MB -> {max(peaks) / 1e6:.1f} MB)")
+        exit(1)
@@ -0,0 +1,34 @@
+# Benchmark for md_to_html.converter.tokenize_line()
+# Shows that tokenizing scales linearly with the line length and with the number of escapes and links.
+
+# imports
+import os, sys, timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from md_to_html import converter
+
+def build_line(units: int) -> str:
+    """
+    Builds a line resembling generated API reference prose.
+    :param units: number of repeated chunks, every chunk contains 2 escapes and a link
+    :return: line of Markdown text
+    """
+    return "get\\_value\\_by [key](api/key.html) returns " * units
+
+def measure(units: int, repeat: int = 5) -> float:
+    """
+    Measures the best time of tokenizing a line built from the given number of units.
+    :param units: number of repeated chunks
+    :param repeat: how many times the measurement is repeated
+    :return: best time in seconds
+    """
+    line = build_line(units)
+    number = max(1, 2000 // units)
+    return min(timeit.repeat(lambda: converter.tokenize_line(line), number=number, repeat=repeat)) / number
+
+if __name__ == "__main__":
+    print(f"{'units':>8} {'chars':>9} {'tokens':>8} {'time [ms]':>10} {'us/unit':>8}")
+    for units in (10, 100, 1000, 10000):
+        seconds = measure(units)
+        chars = len(build_line(units))
+        print(f"{units:>8} {chars:>9} {units * 3:>8} {seconds * 1000:>10.3f} {seconds * 1e6 / units:>8.3f}")
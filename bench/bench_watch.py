@@ -0,0 +1,124 @@
+# Benchmark of the watch mode (main.py watch)
+# Watches a generated tree of Markdown files, and measures the CPU used while idle, the time from a save
+# to its HTML, and the conversion of a burst of saves.
+
+# imports
+import argparse, os, signal, subprocess, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import corpus
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+FILES_PER_DIRECTORY = 100
+
+def build_tree(directory: str, files: int) -> list:
+    """
+    Writes a tree of small Markdown pages.
+    :param directory: root of the tree
+    :param files: number of files
+    :return: relative paths of the files
+    """
+    page = "".join(corpus.generate('mixed', 2 * 1024))
+    paths = []
+    for number in range(files):
+        path = os.path.join(f"section{number // FILES_PER_DIRECTORY}", f"page{number}.md")
+        os.makedirs(os.path.join(directory, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(directory, path), 'w', encoding='utf-8') as file:
+            file.write(page)
+        paths.append(path)
+    return paths
+
+def cpu_seconds(pid: int) -> float:
+    """
+    Reads the CPU time used by a process from /proc.
+    :param pid: process id
+    :return: user and system time in seconds, None when /proc is not available
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            fields = file.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def wait_for_output(path: str, marker: str, timeout: float = 10.0) -> float:
+    """
+    Waits until an HTML file contains the marker.
+    :return: time when the marker was found, None after the timeout
+    """
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with open(path, encoding='utf-8') as file:
+                if marker in file.read():
+                    return time.perf_counter()
+        except OSError:
+            pass
+        time.sleep(0.001)
+    return None
+
+def save(path: str, marker: str) -> None:
+    """
+    Saves a page the way editors do: the new content is written to a temporary file, then moved over the page.
+    """
+    with open(path, encoding='utf-8') as file:
+        content = file.read()
+    with open(path + '.swp', 'w', encoding='utf-8') as file:
+        file.write(content + f"\n{marker}\n")
+    os.replace(path + '.swp', path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the watch mode')
+    parser.add_argument('--files', type=int, default=5000, help='number of files in the tree')
+    parser.add_argument('--saves', type=int, default=20, help='number of single saves to measure')
+    parser.add_argument('--burst', type=int, default=200, help='number of files saved at once')
+    parser.add_argument('--idle', type=float, default=3.0, help='seconds of idle CPU measurement')
+    parser.add_argument('--poll', action='store_true', help='poll the tree instead of using inotify')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'src')
+        output = os.path.join(directory, 'out')
+        paths = build_tree(source, args.files)
+        command = [sys.executable, MAIN_PATH, 'watch', source, output] + (['--poll'] if args.poll else [])
+        process = subprocess.Popen(command, cwd=directory, stdout=subprocess.PIPE, text=True)
+        lines = []
+        start = time.perf_counter()
+        for line in process.stdout:
+            if line.startswith("Watching"):
+                break
+        print(f"{args.files} files built and watched in {time.perf_counter() - start:.1f} s")
+        threading.Thread(target=lambda: lines.extend(process.stdout), daemon=True).start()
+
+        try:
+            before = cpu_seconds(process.pid)
+            time.sleep(args.idle)
+            after = cpu_seconds(process.pid)
+            if before is not None:
+                print(f"idle CPU:      {(after - before) / args.idle:.1%}")
+
+            latencies = []
+            for number in range(args.saves):
+                path = paths[number * len(paths) // args.saves]
+                marker = f"Saved {number} {time.time()}"
+                saved = time.perf_counter()
+                save(os.path.join(source, path), marker)
+                done = wait_for_output(os.path.join(output, os.path.splitext(path)[0] + '.html'), marker)
+                latencies.append(done - saved if done else float('inf'))
+            latencies.sort()
+            print(f"save to HTML:  p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms")
+
+            converted = len(lines)
+            burst = paths[:args.burst]
+            marker = f"Burst {time.time()}"
+            saved = time.perf_counter()
+            for path in burst:
+                save(os.path.join(source, path), marker)
+            done = [wait_for_output(os.path.join(output, os.path.splitext(path)[0] + '.html'), marker) for path in burst]
+            time.sleep(0.5)
+            conversions = sum(1 for line in lines[converted:] if line.startswith("Converted"))
+            print(f"burst of {len(burst)}: all converted in {(max(done) - saved) * 1000:.0f} ms, "
+                  f"{conversions} conversions")
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait()
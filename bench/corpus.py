@@ -0,0 +1,178 @@
+# Seeded generator of synthetic Markdown documents for the benchmarks
+# Every construct supported by the converter has its own generator, so its throughput can be measured on its own.
+
+# imports
+import random
+
+WORDS = ("value", "parser", "block", "render", "token", "stream", "cache", "table", "list", "quote", "index",
+         "config", "output", "header", "module", "request", "response", "buffer", "layout", "element")
+INLINE = ("**{}**", "_{}_", "`{}`", "=={}==", "~~{}~~", "[{}](https://example.com/{})", "{}\\_name", "\\*{}\\*",
+          "H~2~{}", "x^2^{}", "<{}@example.com>", "![{}](img/{}.png)")
+
+def text(rng: random.Random, words: int, markup: float = 0.3) -> str:
+    """
+    Generates a line of prose with some inline formatting.
+    :param rng: random generator
+    :param words: number of words
+    :param markup: share of words with inline formatting
+    :return: line of text without a newline
+    """
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < markup:
+            word = rng.choice(INLINE).format(word, word)
+        parts.append(word)
+    return " ".join(parts)
+
+def escapes(rng: random.Random) -> list:
+    """
+    Long paragraph full of escapes and links, like generated API reference prose.
+    :param rng: random generator
+    :return: list of lines
+    """
+    lines = []
+    for _ in range(rng.randint(5, 20)):
+        line = " ".join(f"get\\_{rng.choice(WORDS)}\\_by\\_{rng.choice(WORDS)} [{rng.choice(WORDS)}](api/{rng.choice(WORDS)}.html)"
+                        for _ in range(rng.randint(3, 8)))
+        lines.append(line + "\n")
+    lines.append("\n")
+    return lines
+
+def tables(rng: random.Random) -> list:
+    """
+    Wide and tall table with an alignment row.
+    :param rng: random generator
+    :return: list of lines
+    """
+    columns = rng.randint(4, 10)
+    alignments = [rng.choice(("---", ":---", "---:", ":---:")) for _ in range(columns)]
+    lines = ["| " + " | ".join(rng.choice(WORDS).title() for _ in range(columns)) + " |\n",
+             "|" + "|".join(alignments) + "|\n"]
+    for _ in range(rng.randint(20, 200)):
+        cells = [rng.choice(("✔", "N/A", "`true`", "`false`", "**ok**", str(rng.randint(0, 9999)), text(rng, 2)))
+                 for _ in range(columns)]
+        lines.append("| " + " | ".join(cells) + " |\n")
+    lines.append("\n")
+    return lines
+
+def lists(rng: random.Random) -> list:
+    """
+    Deeply nested ordered, unordered and task lists.
+    :param rng: random generator
+    :return: list of lines
+    """
+    lines = []
+    kind = rng.choice(("ordered", "unordered", "task"))
+
+    def add_list(depth: int, kind: str) -> None:
+        indent = "  " * depth
+        for number in range(1, rng.randint(2, 5) + 1):
+            if kind == "ordered":
+                marker = f"{number}. "
+            elif kind == "task":
+                marker = rng.choice(("- [ ] ", "- [x] "))
+            else:
+                marker = rng.choice(("- ", "* ", "+ "))
+            lines.append(f"{indent}{marker}{text(rng, rng.randint(2, 8))}\n")
+            if depth < 6 and rng.random() < 0.4:
+                add_list(depth + 1, rng.choice(("ordered", "unordered")) if kind != "task" else "unordered")
+
+    add_list(0, kind)
+    lines.append("\n")
+    return lines
+
+def blockquotes(rng: random.Random) -> list:
+    """
+    Nested blockquotes, like an e-mail thread.
+    :param rng: random generator
+    :return: list of lines
+    """
+    lines = []
+    marker = rng.choice((">", "> "))  # '>>> reply' and '> > > reply' styles
+    for depth in range(1, rng.randint(2, 8) + 1):
+        for _ in range(rng.randint(1, 4)):
+            lines.append((marker * depth).rstrip() + " " + text(rng, rng.randint(4, 12)) + "\n")
+    lines.append("\n")
+    return lines
+
+def code(rng: random.Random) -> list:
+    """
+    Large fenced code block.
+    :param rng: random generator
+    :return: list of lines
+    """
+    lines = ["```python\n"]
+    for number in range(rng.randint(50, 400)):
+        lines.append("    " * rng.randint(0, 3) + f"if {rng.choice(WORDS)} < {number} and x > 0: return a & b  # *not* _md_\n")
+    lines.append("```\n")
+    lines.append("\n")
+    return lines
+
+def references(rng: random.Random) -> list:
+    """
+    Paragraphs of reference-style links, with their definitions before and after them, like a wiki page.
+    :param rng: random generator
+    :return: list of lines
+    """
+    lines = []
+    for _ in range(rng.randint(2, 6)):
+        parts = []
+        for _ in range(rng.randint(3, 10)):
+            label = f"{rng.choice(WORDS)} {rng.randint(0, 19)}"
+            parts.append(text(rng, rng.randint(2, 6), 0.1))
+            parts.append(rng.choice((f"[{rng.choice(WORDS)}][{label}]", f"[{label.title()}][]", f"[{label}]",
+                                     f"![{rng.choice(WORDS)}][{label}]", f"[{label}][undefined]")))
+        lines.append(" ".join(parts) + "\n")
+    lines.append("\n")
+    for _ in range(rng.randint(0, 4)):
+        label = f"{rng.choice(WORDS)} {rng.randint(0, 19)}"
+        lines.append(f"[{label}]: https://example.com/{label.replace(' ', '/')} \"{rng.choice(WORDS)}\"\n")
+    lines.append("\n")
+    return lines
+
+def mixed(rng: random.Random) -> list:
+    """
+    Real-world like document mixing all constructs.
+    :param rng: random generator
+    :return: list of lines
+    """
+    lines = [f"{'#' * rng.randint(1, 6)} {text(rng, 4, 0.1)}\n", "\n"]
+    for _ in range(rng.randint(1, 3)):
+        for _ in range(rng.randint(1, 6)):
+            lines.append(text(rng, rng.randint(5, 20)) + ("  " if rng.random() < 0.1 else "") + "\n")
+        lines.append("\n")
+    generator = rng.choice((escapes, tables, lists, blockquotes, code))
+    lines.extend(generator(rng))
+    if rng.random() < 0.2:
+        lines.append("---\n")
+        lines.append("\n")
+    return lines
+
+CONSTRUCTS = {
+    'escapes': escapes,
+    'tables': tables,
+    'lists': lists,
+    'blockquotes': blockquotes,
+    'code': code,
+    'references': references,
+    'mixed': mixed,
+}
+
+def generate(construct: str, size: int, seed: int = 0) -> list:
+    """
+    Generates a document made of the given construct.
+    :param construct: name of the construct, a key of CONSTRUCTS
+    :param size: minimal size of the document in characters
+    :param seed: seed of the random generator, the same seed always gives the same document
+    :return: list of lines, as returned by readlines()
+    """
+    rng = random.Random(f"{construct}:{seed}")
+    generator = CONSTRUCTS[construct]
+    lines = []
+    total = 0
+    while total < size:
+        block = generator(rng)
+        lines.extend(block)
+        total += sum(map(len, block))
+    return lines
@@ -0,0 +1,158 @@
+# Load test of the render server (main.py serve)
+# Starts a local server, or uses a running one, and sends Markdown documents from the benchmark corpus over
+# several keep-alive connections. Reports the throughput and the latency percentiles.
+
+# imports
+import argparse, asyncio, json, os, random, subprocess, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import corpus
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+def build_documents(count: int, size: int) -> list:
+    """
+    Generates distinct documents of the mixed corpus.
+    :param count: number of documents
+    :param size: approximate size of every document in bytes
+    :return: list of UTF-8 encoded documents
+    """
+    return ["".join(corpus.generate('mixed', size, seed)).encode('utf-8') for seed in range(count)]
+
+def start_server(jobs: int, directory: str) -> tuple:
+    """
+    Starts a server on a free port and waits until it's ready.
+    :param jobs: number of worker processes of the server
+    :param directory: working directory of the server, for its log files
+    :return: (process, host, port)
+    """
+    command = [sys.executable, MAIN_PATH, 'serve', '--port', '0']
+    if jobs:
+        command += ['--jobs', str(jobs)]
+    process = subprocess.Popen(command, cwd=directory, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()  # Serving on http://127.0.0.1:PORT
+    if not line.startswith("Serving on http://"):
+        process.kill()
+        raise RuntimeError(f"The server didn't start: {line!r}")
+    host, port = line.split("http://", 1)[1].split(",")[0].strip().rsplit(":", 1)
+    return process, host, int(port)
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, method: str, path: str,
+                  body: bytes = b"") -> tuple:
+    """
+    Sends a request over a keep-alive connection and reads the response.
+    :return: (status, response body)
+    """
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1'))
+    writer.write(body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode('latin-1').split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def run_client(host: str, port: int, requests: list, latencies: list, errors: list) -> None:
+    """
+    Sends requests one after another over a single connection.
+    :param requests: list of (path, body) tuples
+    :param latencies: list the latencies in seconds are appended to
+    :param errors: list the failed requests are appended to
+    :return: None
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path, body in requests:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, 'POST', path, body)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append((path, status))
+    finally:
+        writer.close()
+
+async def load(host: str, port: int, documents: list, connections: int, total: int, unique: float, batch: int) -> tuple:
+    """
+    Sends the requests over all connections at once.
+    :return: (latencies, errors, elapsed seconds, statistics of the server)
+    """
+    rng = random.Random(0)
+    plans = [[] for _ in range(connections)]
+    for number in range(total):
+        picked = []
+        for _ in range(batch):
+            document = rng.choice(documents)
+            if rng.random() < unique:
+                document += f"\nRequest {number}\n".encode('utf-8')  # never seen before, misses the cache
+            picked.append(document)
+        if batch == 1:
+            plans[number % connections].append(('/render', picked[0]))
+        else:
+            body = json.dumps([document.decode('utf-8') for document in picked]).encode('utf-8')
+            plans[number % connections].append(('/batch', body))
+
+    # Warm-up, so the start of the worker processes is not measured.
+    await run_client(host, port, [('/render', document) for document in documents[:connections]], [], [])
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, plan, latencies, errors) for plan in plans))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await request(reader, writer, host, 'GET', '/stats')
+    writer.close()
+    return latencies, errors, elapsed, json.loads(stats)
+
+def percentile(values: list, share: float) -> float:
+    """
+    :param values: sorted list of values
+    :param share: percentile as a share, e.g. 0.99
+    :return: nearest-rank percentile
+    """
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test of the render server')
+    parser.add_argument('--url', help='address of a running server, e.g. http://127.0.0.1:8000 (default: start one)')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes of the started server')
+    parser.add_argument('--connections', '-c', type=int, default=16, help='number of keep-alive connections')
+    parser.add_argument('--requests', '-n', type=int, default=2000, help='total number of requests')
+    parser.add_argument('--documents', type=int, default=50, help='number of distinct documents')
+    parser.add_argument('--size', type=int, default=8 * 1024, help='size of the documents in bytes')
+    parser.add_argument('--unique', type=float, default=0.2, help='share of documents made unique, missing the cache')
+    parser.add_argument('--batch', type=int, default=1, help='documents per request, sent to /batch when over 1')
+    parser.add_argument('--max-p99', type=float, default=None, help='fail when the p99 latency is over this many ms')
+    args = parser.parse_args()
+
+    documents = build_documents(args.documents, args.size)
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        if args.url:
+            host, port = args.url.split("://", 1)[-1].rstrip("/").rsplit(":", 1)
+            port = int(port)
+        else:
+            process, host, port = start_server(args.jobs, directory)
+        try:
+            latencies, errors, elapsed, stats = asyncio.run(
+                load(host, port, documents, args.connections, args.requests, args.unique, args.batch))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    latencies.sort()
+    print(f"{len(latencies)} requests of {args.batch} document(s) over {args.connections} connections "
+          f"in {elapsed:.2f} s ({len(latencies) / elapsed:.0f} requests/s), {len(errors)} errors")
+    print(f"latency  p50 {percentile(latencies, 0.5) * 1000:.2f} ms  p90 {percentile(latencies, 0.9) * 1000:.2f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms  max {latencies[-1] * 1000:.2f} ms")
+    print(f"cache    hit rate {stats['hit_rate']:.0%}, {stats['misses']} conversions, {stats['coalesced']} coalesced")
+    if errors:
+        exit(1)
+    if args.max_p99 is not None and percentile(latencies, 0.99) * 1000 > args.max_p99:
+        print(f"FAILED: p99 latency over {args.max_p99} ms")
+        exit(1)
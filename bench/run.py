@@ -0,0 +1,264 @@
+# Benchmark suite of the converter
+# Measures throughput and peak memory for every construct of the synthetic corpus at several sizes,
+# checks the output of handle_conversion() and convert_file() against the golden HTML
+# and fails when a run regresses past the stored baseline.
+# Throughput depends on the machine, so it's only compared with a baseline stored on the same machine.
+# Elsewhere a slower row is a warning, until --update-baseline has been run there.
+#
+# Usage:
+#   python bench/run.py                      run all benchmarks and compare them with the baseline
+#   python bench/run.py tables lists         run only some constructs
+#   python bench/run.py --update-baseline    store the current results as the new baseline
+#   python bench/run.py --update-golden      store the current output as the golden HTML (after an intended change)
+
+# imports
+import argparse, hashlib, json, os, platform, sys, tempfile, time, tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+import corpus
+from md_to_html import converter
+
+SIZES = {'small': 8 * 1024, 'medium': 128 * 1024, 'large': 512 * 1024}
+GOLDEN_DIR = os.path.join(BENCH_DIR, 'golden')
+GOLDEN_HASHES = os.path.join(GOLDEN_DIR, 'hashes.json')
+BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+TOLERANCE = 0.25  # allowed relative regression of throughput and peak memory
+MEMORY_SLACK = 256 * 1024  # peak memory growth below this many bytes is never a regression
+# Documents that convert_stream() must convert the same way as convert(), e.g. with nodes held back for a definition
+STREAM_CASES = (
+    "See [it][foo].\n\n[foo]: http://f\n\nLast paragraph.\n",
+    "[a][] and [b][]\n\n[a]: http://a\n\nMiddle.\n\n[b]: http://b\n\nEnd.\n",
+    "| x |\n|---|\n| [t][] |\n\nAfter.\n\n[t]: http://t\n\nEnd.\n",
+)
+# Inline formatting that must render as it did before the single-scan formatter: only a run with whitespace
+# on both sides is text
+FORMATTING_CASES = {
+    "**word **": "<b>word </b>",
+    "* not italic*": "<i> not italic</i>",
+    "==wordx  ==": "<mark>wordx  </mark>",
+    "***  x***": "<b><i>  x</i></b>",
+    "2 * 3 and *x*": "2 * 3 and <i>x</i>",
+}
+# A changelog starts with a shortcut reference that is never defined, which must not hold back the blocks after it
+CHANGELOG_LINES = ["## [Unreleased]\n", "\n"] + ["Text.\n", "\n"] * 2000
+
+def measure(lines: list, repeat: int) -> dict:
+    """
+    Converts the lines several times and measures the best time, then once more to trace the peak memory.
+    :param lines: Markdown lines
+    :param repeat: number of timed conversions
+    :return: dictionary with the HTML and the measurements
+    """
+    size = sum(map(len, lines))
+    best = None
+    html = None
+    for _ in range(repeat):
+        converter.set_inline_cache_size(converter.INLINE_CACHE_SIZE)  # every run starts with an empty inline memo
+        start = time.perf_counter()
+        html = converter.handle_conversion(lines)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    converter.set_inline_cache_size(converter.INLINE_CACHE_SIZE)
+    tracemalloc.start()
+    converter.handle_conversion(lines)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'html': html,
+        'mb_per_s': size / best / 1e6,
+        'lines_per_s': len(lines) / best,
+        'peak_bytes': peak,
+    }
+
+def load_json(path: str) -> dict:
+    """
+    Loads a JSON file, empty dictionary if it doesn't exist.
+    :param path: path to the file
+    :return: loaded dictionary
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def save_json(path: str, data: dict) -> None:
+    """
+    Saves a dictionary as a JSON file.
+    :param path: path to the file
+    :param data: dictionary to save
+    :return: None
+    """
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=1, sort_keys=True)
+        file.write('\n')
+
+def check_golden(construct: str, size_name: str, html: str, hashes: dict, update: bool) -> str:
+    """
+    Compares the output with the golden HTML. The smallest size is stored as a readable HTML file,
+    the other sizes only as a hash.
+    :param construct: name of the construct
+    :param size_name: name of the size
+    :param html: output of the converter
+    :param hashes: golden hashes, updated in place when update is True
+    :param update: store the output as the new golden HTML
+    :return: empty string when the output matches, otherwise the description of the problem
+    """
+    key = f"{construct}/{size_name}"
+    digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+    golden_file = os.path.join(GOLDEN_DIR, f"{construct}.html")
+    if update:
+        hashes[key] = digest
+        if size_name == 'small':
+            with open(golden_file, 'w', encoding='utf-8', newline='') as file:
+                file.write(html)
+        return ""
+    if key not in hashes:
+        return "no golden output"
+    if hashes[key] != digest:
+        if size_name == 'small' and os.path.exists(golden_file):
+            with open(golden_file, 'r', encoding='utf-8', newline='') as file:
+                golden = file.read()
+            for number, (expected, actual) in enumerate(zip(golden.splitlines(), html.splitlines()), start=1):
+                if expected != actual:
+                    return f"output differs from golden at line {number}: {actual[:60]!r}"
+        return "output differs from golden"
+    return ""
+
+def check_stream_cases() -> str:
+    """
+    Converts the STREAM_CASES with convert_stream() and compares them with convert(), and checks that
+    the first block of CHANGELOG_LINES is yielded before the rest of the lines are read.
+    :return: empty string when all of them pass, otherwise the description of the first problem
+    """
+    for text in STREAM_CASES:
+        streamed = "".join(converter.convert_stream(text.splitlines(keepends=True), config={}))
+        expected = converter.convert(text, config={})
+        if streamed != expected:
+            return f"convert_stream() of {text[:30]!r} differs from convert(): {streamed[:60]!r}"
+    lines = iter(CHANGELOG_LINES)
+    next(converter.convert_stream(lines, config={}))
+    read = len(CHANGELOG_LINES) - len(list(lines))
+    if read > 3:
+        return f"convert_stream() read {read} lines of a changelog before its first block"
+    return ""
+
+def check_formatting_cases() -> str:
+    """
+    Formats the FORMATTING_CASES and compares them with the expected HTML.
+    :return: empty string when all of them match, otherwise the description of the first mismatch
+    """
+    for text, expected in FORMATTING_CASES.items():
+        html = converter.format_inline(text)
+        if html != expected:
+            return f"format_inline() of {text!r} gives {html!r} instead of {expected!r}"
+    return ""
+
+def convert_through_file(lines: list) -> str:
+    """
+    Converts the lines the way builds and watch mode do, by convert_file() from a temporary file.
+    :param lines: Markdown lines
+    :return: output HTML
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'input.md')
+        output_path = os.path.join(directory, 'output.html')
+        with open(input_path, 'w', encoding='utf-8', newline='') as file:
+            file.writelines(lines)
+        converter.convert_file(input_path, output_path)
+        with open(output_path, 'r', encoding='utf-8', newline='') as file:
+            return file.read()
+
+def machine_id() -> str:
+    """
+    Identifies the machine and the Python build the benchmarks run on, hashed so the baseline doesn't store the host name.
+    :return: short hexadecimal identifier
+    """
+    description = f"{platform.node()}|{platform.machine()}|{platform.processor()}|{os.cpu_count()}|{sys.version}"
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()[:16]
+
+def check_baseline(key: str, result: dict, baseline: dict, tolerance: float) -> tuple:
+    """
+    Compares the measurements with the baseline. Peak memory doesn't depend on the speed of the machine and is
+    always compared, a throughput regression is only a warning when the baseline was measured on another machine.
+    :param key: construct/size key
+    :param result: measurements
+    :param baseline: stored baseline
+    :param tolerance: allowed relative regression
+    :return: (description of the regressions, description of the warnings), empty strings when within the tolerance
+    """
+    if key not in baseline:
+        return "", ""
+    expected = baseline[key]
+    problems = []
+    warnings = []
+    if result['mb_per_s'] < expected['mb_per_s'] * (1 - tolerance):
+        message = f"throughput {result['mb_per_s']:.2f} < {expected['mb_per_s']:.2f} MB/s"
+        if baseline.get('machine') == machine_id():
+            problems.append(message)
+        else:
+            warnings.append(f"warning: {message}")
+    if result['peak_bytes'] > max(expected['peak_bytes'] * (1 + tolerance), expected['peak_bytes'] + MEMORY_SLACK):
+        problems.append(f"peak memory {result['peak_bytes'] / 1e6:.1f} > {expected['peak_bytes'] / 1e6:.1f} MB")
+    return ", ".join(problems), ", ".join(warnings)
+
+def run(constructs: list, sizes: list, repeat: int, tolerance: float, update_baseline: bool, update_golden: bool) -> int:
+    """
+    Runs the benchmarks and prints the results.
+    :return: 0 - Success, 1 - Regression or wrong output
+    """
+    baseline = load_json(BASELINE)
+    hashes = load_json(GOLDEN_HASHES)
+    problem = check_stream_cases() or check_formatting_cases()
+    failed = bool(problem)
+    if problem:
+        print(problem)
+    if baseline and not update_baseline and baseline.get('machine') != machine_id():
+        print("The baseline was measured on another machine: slower throughput is only a warning "
+              "until --update-baseline is run here.")
+    print(f"{'construct':<12} {'size':<7} {'input':>9} {'MB/s':>7} {'lines/s':>10} {'peak MB':>8}  status")
+    for construct in constructs:
+        for size_name in sizes:
+            lines = corpus.generate(construct, SIZES[size_name])
+            # Small documents are converted more times, as their timings are noisier.
+            result = measure(lines, repeat * max(1, SIZES['medium'] // SIZES[size_name]))
+            key = f"{construct}/{size_name}"
+            golden_problem = check_golden(construct, size_name, result['html'], hashes, update_golden)
+            # The streaming path of builds and watch mode must give the same output.
+            file_problem = check_golden(construct, size_name, convert_through_file(lines), hashes, False)
+            baseline_problem, warning = check_baseline(key, result, {} if update_baseline else baseline, tolerance)
+            problems = [problem for problem in (
+                golden_problem,
+                file_problem and f"convert_file(): {file_problem}",
+                baseline_problem,
+            ) if problem]
+            failed = failed or bool(problems)
+            if update_baseline:
+                baseline[key] = {'mb_per_s': round(result['mb_per_s'], 3), 'peak_bytes': result['peak_bytes']}
+            status = '; '.join(problems + [warning] if warning else problems) or 'ok'
+            print(f"{construct:<12} {size_name:<7} {sum(map(len, lines)) / 1024:>7.0f}kB {result['mb_per_s']:>7.2f} "
+                  f"{result['lines_per_s']:>10.0f} {result['peak_bytes'] / 1e6:>8.1f}  {status}")
+    if update_baseline:
+        baseline['machine'] = machine_id()
+        save_json(BASELINE, baseline)
+    if update_golden:
+        save_json(GOLDEN_HASHES, hashes)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark suite of the Markdown to HTML converter')
+    parser.add_argument('constructs', nargs='*', help=f"constructs to run: {', '.join(corpus.CONSTRUCTS)} (default: all)")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES), help='document sizes to run')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs, the best one is reported')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed relative regression')
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--update-golden', action='store_true', help='store the output as the new golden HTML')
+    args = parser.parse_args()
+    unknown = [construct for construct in args.constructs if construct not in corpus.CONSTRUCTS]
+    if unknown:
+        parser.error(f"unknown construct: {', '.join(unknown)}")
+    exit(run(args.constructs or list(corpus.CONSTRUCTS), args.sizes, args.repeat, args.tolerance,
+             args.update_baseline, args.update_golden))
@@ -2,15 +2,22 @@
 # Markdown to HTML converter by Syhmac
 
 # imports
-import json, os, re
-import simple_logger
-
-# Initialize the logger
-log = simple_logger.LOG(0, 'latest.log', 'logs/')
+import os, sys
+from md_to_html import convert_file, convert_stream, set_logger
+from md_to_html.logger import log
 
 # Global variables
 cl = 'cls' if os.name == 'nt' else 'clear'
 
+def start_logging() -> None:
+    """
+    Creates the log file and sets the logger of the converter. Called when the program starts,
+    so importing this module doesn't touch the filesystem.
+    :return: None
+    """
+    import simple_logger
+    set_logger(simple_logger.LOG(0, 'latest.log', 'logs/'))
+
 def clear():
     """
     Clears the console screen based on the operating system.
@@ -30,7 +37,7 @@ def main_menu() -> int:
 
     print("Markdown to HTML Converter")
     print("1. Convert Markdown to HTML")
-    print("2. Configuration (Will be implemented later)")
+    print("2. Configuration")
     print("3. Exit")
 
     choice = input("Enter your choice: ")
@@ -46,6 +53,7 @@ def main_menu() -> int:
             convert_markdown_to_html()
             return 0
         case 2:
+            config()
             return 0
         case 3:
             log.info("Exiting the program.")
@@ -54,8 +62,70 @@ def main_menu() -> int:
             log.error(f"Unexpected choice in main menu: {choice}")
             return -1
 
-def config():
-    pass
+def config() -> int:
+    """
+    Configuration menu, sets the CSS classes of the HTML elements in the configuration file.
+    A default configuration file is created if there is none.
+    :return: 0 - Success, -1 - Error
+    """
+    import json
+    from md_to_html.converter import CONFIG_ELEMENTS, CONFIG_PATH, config_classes, default_config
+
+    if not os.path.exists(CONFIG_PATH):
+        save_config(default_config())
+        log.info(f"Default configuration file created: {CONFIG_PATH}")
+    try:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
+            settings = json.load(file)
+        if not isinstance(settings, dict):
+            raise ValueError("expected a JSON object")
+        classes = dict(config_classes(settings))
+    except (OSError, ValueError) as e:
+        log.error(f"Cannot read the configuration file {CONFIG_PATH}: {e}")
+        print(f"Cannot read the configuration file {CONFIG_PATH}: {e}")
+        input("Press Enter to return to the menu.")
+        return -1
+
+    while True:
+        try:
+            clear()
+        except Exception as e:
+            log.warn(f"Error clearing screen: {e}")
+        print("Configuration - CSS classes of the HTML elements")
+        for number, element in enumerate(CONFIG_ELEMENTS, 1):
+            print(f"{number:>2}. {element:<12}{classes.get(element, '')}")
+        print(" 0. Save and return to the menu")
+
+        choice = input("Enter the element to change: ")
+        try:
+            choice = int(choice)
+        except ValueError:
+            log.error(f"Invalid configuration menu choice: {choice}")
+            continue
+        if choice == 0:
+            break
+        if not 1 <= choice <= len(CONFIG_ELEMENTS):
+            log.error(f"Unexpected choice in configuration menu: {choice}")
+            continue
+        element = CONFIG_ELEMENTS[choice - 1]
+        classes[element] = input(f"Enter the CSS classes of <{element}> (empty for none): ").strip()
+
+    settings['classes'] = classes
+    save_config(settings)
+    log.info("Configuration saved.")
+    return 0
+
+def save_config(settings: dict) -> None:
+    """
+    Writes the configuration file.
+    :param settings: configuration in the format of md_to_html_config.json
+    :return: None
+    """
+    import json
+    from md_to_html.converter import CONFIG_PATH
+    with open(CONFIG_PATH, 'w', encoding='utf-8') as file:
+        json.dump(settings, file, indent=4)
+        file.write('\n')
 
 def convert_markdown_to_html() -> int:
     """
@@ -71,695 +141,71 @@ def convert_markdown_to_html() -> int:
         log.error("Output file must have .html extension.")
         return -1
 
-    log.info("Loading Markdown file.")
-
-    input_file = open(input_path, 'r', encoding='utf-8')
-    output_file = open(output_path, 'w', encoding='utf-8')
-
-    lines = input_file.readlines()
-    input_file.close()
-
     log.info("Converting Markdown to HTML.")
-    output_html = handle_conversion(lines)
 
-    log.info("Writing HTML to file.")
-    output_file.write(output_html)
-    output_file.close()
+    # The HTML is written block by block, so the whole file is never held in memory.
+    convert_file(input_path, output_path)
 
+    log.info("HTML file saved.")
     return 0
 
-def handle_conversion(lines: list) -> str:
-    """
-    Handles the conversion of Markdown lines to HTML.
-    :param lines:
-    :return: output HTML as a string
-    """
-    output = ""
-    currently_open = []  # track currently open tags. Last is the latest.
-    skip_lines = 0
-    for i in range(len(lines)):
-        if skip_lines > 0:
-            skip_lines -= 1
-            continue
-        # Check if the line is empty - closing the currently open tag if it is.
-        if lines[i].startswith("\n"):
-            if currently_open != []:
-                output += f"</{currently_open[-1]}>\n"
-                currently_open.pop(-1)
-            continue
-        # Check for headers
-        if lines[i].startswith('#'):  # We check for any number of '#' first, so we don't check every length option for the lines that are not headers.
-            temp = close_any_open_paragraph(currently_open, output)
-            currently_open = temp[0]
-            output = temp[1]
-            if lines[i].startswith('# '):  # H1
-                currently_open.append("h1")
-                lines[i] = lines[i].lstrip('# ')
-            elif lines[i].startswith('## '):  # H2
-                currently_open.append("h2")
-                lines[i] = lines[i].lstrip('## ')
-            elif lines[i].startswith('### '):  # H3
-                currently_open.append("h3")
-                lines[i] = lines[i].lstrip('### ')
-            elif lines[i].startswith('#### '):  # H4
-                currently_open.append("h4")
-                lines[i] = lines[i].lstrip('#### ')
-            elif lines[i].startswith('##### '):  # H5
-                currently_open.append("h5")
-                lines[i] = lines[i].lstrip('##### ')
-            elif lines[i].startswith('###### '):  # H6
-                currently_open.append("h6")
-                lines[i] = lines[i].lstrip('###### ')
-            else:
-                log.warn(f"Unexpected header format! Too many #: {lines[i]}")
-                log.warn(f"Treating the line as H6 header.")
-                currently_open.append("h6")
-                lines[i] = lines[i].lstrip('######')
-            lines[i] = lines[i].rstrip('\n')
-            tokenized_line = tokenize_line(lines[i])
-            tokenized_line[0] = check_for_formatting(tokenized_line[0])
-            formatted_output = detokenize_line(tokenized_line[0], tokenized_line[1])
-            output += f"<{currently_open[-1]}>{formatted_output}"
-        # Check for blockquotes
-        elif lines[i].startswith('>'):
-            temp = close_any_open_paragraph(currently_open, output)
-            currently_open = temp[0]
-            output = temp[1]
-            blockquote_lines = []
-            blockquote_ended = False
-            line_count = 0
-            while not blockquote_ended:
-                try:
-                    blockquote_lines.append(lines[i + line_count])
-                    line_count += 1
-                    if not lines[i + line_count].startswith(">"):
-                        blockquote_ended = True
-                except IndexError:
-                    blockquote_ended = True
-            skip_lines += line_count - 1
-            blockquote_output = handle_blockquote(blockquote_lines)
-            output += blockquote_output
-        # Check for tables
-        elif lines[i].startswith('| '):
-            temp = close_any_open_paragraph(currently_open, output)
-            currently_open = temp[0]
-            output = temp[1]
-            table_lines = []
-            table_ended = False
-            line_count = 0
-            while not table_ended:
-                try:
-                    table_lines.append(lines[i + line_count])
-                    line_count += 1
-                    if not lines[i + line_count].startswith("| ") and not lines[i + line_count].startswith("|:") and not lines[i + line_count].startswith("|-"):
-                        table_ended = True
-                except IndexError:
-                    table_ended = True
-            skip_lines += line_count - 1
-            table_output = handle_table(table_lines)
-            output += table_output
-        # Check for task lists
-        elif re.match(r'- \[([ x])] (.+)', lines[i]):
-            temp = close_any_open_paragraph(currently_open, output)
-            currently_open = temp[0]
-            output = temp[1]
-            task_list_lines = []
-            task_list_ended = False
-            line_count = 0
-            while not task_list_ended:
-                try:
-                    task_list_lines.append(lines[i + line_count])
-                    line_count += 1
-                    if not re.match(r'- \[([ x])] (.+)', lines[i + line_count]) and not lines[i + line_count].startswith(' '):
-                        task_list_ended = True
-                except IndexError:
-                    task_list_ended = True
-            skip_lines += line_count - 1
-            task_list_output = handle_task_list(task_list_lines)
-            output += task_list_output
-        # Check for ordered lists
-        elif lines[i].startswith('1. '):
-            temp = close_any_open_paragraph(currently_open, output)
-            currently_open = temp[0]
-            output = temp[1]
-            ordered_list_lines = []
-            ordered_list_ended = False
-            line_count = 0
-            while not ordered_list_ended:
-                try:
-                    ordered_list_lines.append(lines[i + line_count])
-                    line_count += 1
-                    # Check the line using regex to see if it starts with a number followed by a dot and space.
-                    if not re.match(r'^\d+\.\s', lines[i + line_count]) and not lines[i + line_count].startswith(' '):
-                        ordered_list_ended = True
-                except IndexError:
-                    ordered_list_ended = True
-            skip_lines += line_count - 1
-            ordered_list_output = handle_ordered_list(ordered_list_lines)
-            output += ordered_list_output
-        # Check for unordered lists
-        elif lines[i].startswith('- ') or lines[i].startswith('* ') or lines[i].startswith('+ '):
-            temp = close_any_open_paragraph(currently_open, output)
-            currently_open = temp[0]
-            output = temp[1]
-            unordered_list_lines = []
-            unordered_list_ended = False
-            line_count = 0
-            while not unordered_list_ended:
-                try:
-                    unordered_list_lines.append(lines[i + line_count])
-                    line_count += 1
-                    if not (lines[i + line_count].startswith('- ') or lines[i + line_count].startswith('* ') or lines[i + line_count].startswith('+ ') or lines[i + line_count].startswith(' ')):
-                        unordered_list_ended = True
-                except IndexError:
-                    unordered_list_ended = True
-            skip_lines += line_count - 1
-            unordered_list_output = handle_unordered_list(unordered_list_lines)
-            output += unordered_list_output
-        # Check for code blocks
-        elif lines[i].startswith('```'):
-            temp = close_any_open_paragraph(currently_open, output)
-            currently_open = temp[0]
-            output = temp[1]
-            code_block_lines = []
-            code_block_ended = False
-            line_count = 0
-            while not code_block_ended:
-                try:
-                    code_block_lines.append(lines[i + line_count])
-                    line_count += 1
-                    if not lines[i + line_count].startswith('```'):
-                        continue
-                    else:
-                        code_block_ended = True
-                except IndexError:
-                    code_block_ended = True
-            skip_lines += line_count
-            code_block_output = handle_code_block(code_block_lines)
-            output += code_block_output
-        # Check for vertical rules
-        elif re.match(r'(\*{3,}|-{3,}|_{3,})\s*\n', lines[i]):
-            output += "<hr>\n"
-        # Check for paragraphs
-        # If nothing else is found, we treat the line as a paragraph.
-        else:
-            if (currently_open != [] and currently_open[-1] != "p") or currently_open == []:
-                currently_open.append("p")
-                output += f"<{currently_open[-1]}>"
-            elif currently_open != [] and currently_open[-1] == "p":
-                if not output.endswith("<br>"):
-                    output += " "
-            lines[i] = lines[i].rstrip('\n')
-            tokenized_line = tokenize_line(lines[i])
-            tokenized_line[0] = check_for_formatting(tokenized_line[0])
-            formatted_output = detokenize_line(tokenized_line[0], tokenized_line[1])
-            output += formatted_output
-
-    if currently_open != []:
-        while len(currently_open) > 0:
-            output += f"</{currently_open[-1]}>\n"
-            currently_open.pop(-1)
-
-    return output
-
-def close_any_open_paragraph(currently_open: list, output: str) -> list:
-    """
-    Closes any open paragraph tags in the output.
-    :param currently_open: list of currently open tags
-    :param output: current output string
-    :return: newly updated currently_open list and output string
+def convert_stdin_to_stdout() -> int:
     """
-    if currently_open != [] and currently_open[-1] == "p":
-        output += "</p>\n"
-        currently_open.pop(-1)
-    output_list = [currently_open, output]
-    return output_list
-
-def tokenize_line(line: str) -> list:
-    """
-    Tokenizes a line by replacing images, links and escape characters with tokens.
-    :param line:
-    :return: [tokenized string, [key0, key1, ...]]
+    Converts Markdown read from the standard input and writes the HTML to the standard output.
+    Used as a filter in shell pipelines: python main.py - < input.md > output.html
+    :return: 0 - Success
     """
-    found_token = True
-    tokens = []
-    token_id = 0
-    while found_token:
-        found_token = False
-        if re.search(r'(\\{2})', line):
-            found_token = True
-            tokens.append("\\\\")
-            line = re.sub(r'(\\{2})', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\`)', line):
-            found_token = True
-            tokens.append("`")
-            line = re.sub(r'(\\`)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\\*)', line):
-            found_token = True
-            tokens.append("*")
-            line = re.sub(r'(\\\*)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\_)', line):
-            found_token = True
-            tokens.append("_")
-            line = re.sub(r'(\\_)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\{)', line):
-            found_token = True
-            tokens.append("{")
-            line = re.sub(r'(\\{)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\})', line):
-            found_token = True
-            tokens.append("}")
-            line = re.sub(r'(\\})', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\\[)', line):
-            found_token = True
-            tokens.append("[")
-            line = re.sub(r'(\\\[)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\])', line):
-            found_token = True
-            tokens.append("]")
-            line = re.sub(r'(\\])', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\<)', line):
-            found_token = True
-            tokens.append("<")
-            line = re.sub(r'(\\<)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\>)', line):
-            found_token = True
-            tokens.append(">")
-            line = re.sub(r'(\\>)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\\()', line):
-            found_token = True
-            tokens.append("(")
-            line = re.sub(r'(\\\()', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\\))', line):
-            found_token = True
-            tokens.append(")")
-            line = re.sub(r'(\\\))', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\#)', line):
-            found_token = True
-            tokens.append("#")
-            line = re.sub(r'(\\#)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\\+)', line):
-            found_token = True
-            tokens.append("+")
-            line = re.sub(r'(\\\+)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\-)', line):
-            found_token = True
-            tokens.append("-")
-            line = re.sub(r'(\\-)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\\.)', line):
-            found_token = True
-            tokens.append(".")
-            line = re.sub(r'(\\\.)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\!)', line):
-            found_token = True
-            tokens.append("!")
-            line = re.sub(r'(\\!)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\=)', line):
-            found_token = True
-            tokens.append("=")
-            line = re.sub(r'(\\=)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\~)', line):
-            found_token = True
-            tokens.append("~")
-            line = re.sub(r'(\\~)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'(\\\|)', line):
-            found_token = True
-            tokens.append("|")
-            line = re.sub(r'(\\\|)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'!\[(.+?)]\((.+?)\)', line):
-            found_token = True
-            match = re.search(r'!\[(.+?)]\((.+?)\)', line)
-            alt_text = match.group(1)
-            img_url = match.group(2)
-            img_tag = f'<img src="{img_url}" alt="{alt_text}">'
-            tokens.append(img_tag)
-            line = re.sub(r'!\[(.+?)]\((.+?)\)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'\[(.+?)]\((.+?)\)', line):
-            found_token = True
-            match = re.search(r'\[(.+?)]\((.+?)\)', line)
-            link_text = match.group(1)
-            link_url = match.group(2)
-            link_tag = f'<a href="{link_url}">{link_text}</a>'
-            tokens.append(link_tag)
-            line = re.sub(r'\[(.+?)]\((.+?)\)', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'<([^>]+?@[^>]+?)>', line):
-            found_token = True
-            match = re.search(r'<([^>]+?@[^>]+?)>', line)
-            email = match.group(1)
-            email_tag = f'<a href="mailto:{email}">{email}</a>'
-            tokens.append(email_tag)
-            line = re.sub(r'<([^>]+?@[^>]+?)>', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-        if re.search(r'<(.+?)>', line):
-            found_token = True
-            match = re.search(r'<(.+?)>', line)
-            url = match.group(1)
-            url_tag = f'<a href="{url}">{url}</a>'
-            tokens.append(url_tag)
-            line = re.sub(r'<(.+?)>', f'{token_id}-TOKEN', line, count=1)
-            token_id += 1
-            continue
-
-    output = [line, tokens]
-    return output
-
-def detokenize_line(line: str, tokens: list) -> str:
-    """
-    Replaces tokens in the line with the corresponding image or link tags.
-    :param line: line with tokens
-    :param tokens: list of tokens to replace
-    :return: line with tokens replaced by image or link tags
-    """
-    token_found = True
-    while token_found:
-        token_found = False
-        if re.search(r'\d+-TOKEN', line):
-            token_found = True
-            match = re.search(r'(\d+)-TOKEN', line)
-            token_index = int(match.group(1))
-            line = re.sub(r'\d+-TOKEN', tokens[token_index], line, count=1)
-            continue
-    return line
-
-def check_for_formatting(line: str) -> str:
-    """
-    Checks for Markdown formatting in the line and returns the formatted line.
-    :param line: line from the Markdown file
-    :return: Text formatted as HTML
-    """
-    found_formating = True
-    while found_formating:
-        found_formating = False
-        if line.find("***") != -1:
-            found_formating = True
-            line = line.replace("***", "<b><i>", 1)
-            line = line.replace("***", "</i></b>", 1)
-        if line.find("___") != -1:
-            found_formating = True
-            line = line.replace("___", "<b><i>", 1)
-            line = line.replace("___", "</i></b>", 1)
-        if line.find("**_") != -1:
-            found_formating = True
-            line = line.replace("**_", "<b><i>", 1)
-            line = line.replace("_**", "</i></b>", 1)
-        if line.find("__*") != -1:
-            found_formating = True
-            line = line.replace("__*", "<b><i>", 1)
-            line = line.replace("*__", "</i></b>", 1)
-        if line.find("**") != -1:
-            found_formating = True
-            line = line.replace("**", "<b>", 1)
-            line = line.replace("**", "</b>", 1)
-        if line.find("__") != -1:
-            found_formating = True
-            line = line.replace("__", "<b>", 1)
-            line = line.replace("__", "</b>", 1)
-        if line.find("*") != -1:
-            found_formating = True
-            line = line.replace("*", "<i>", 1)
-            line = line.replace("*", "</i>", 1)
-        if line.find("_") != -1:
-            found_formating = True
-            line = line.replace("_", "<i>", 1)
-            line = line.replace("_", "</i>", 1)
-        if line.find("~~") != -1:
-            found_formating = True
-            line = line.replace("~~", "<s>", 1)
-            line = line.replace("~~", "</s>", 1)
-        if line.find("~") != -1:
-            found_formating = True
-            line = line.replace("~", "<sub>", 1)
-            line = line.replace("~", "</sub>", 1)
-        if line.find("^") != -1:
-            found_formating = True
-            line = line.replace("^", "<sup>", 1)
-            line = line.replace("^", "</sup>", 1)
-        if line.find("`") != -1:
-            found_formating = True
-            line = line.replace("`", "<code>", 1)
-            line = line.replace("`", "</code>", 1)
-        if line.find("==") != -1:
-            found_formating = True
-            line = line.replace("==", "<mark>", 1)
-            line = line.replace("==", "</mark>", 1)
-    if line.endswith("  "):
-        line = line.rstrip("  ")
-        line += "<br>"
-    return line
-
-def handle_blockquote(lines: list) -> str:
-    """
-    Handles blockquotes
-    :param lines: all lines that belong to the blockquote
-    :return: Formatted blockquote as HTML
-    """
-    output = "<blockquote>\n"
-    for i in range (len(lines)):
-        if lines[i].startswith("> "):
-            lines[i] = lines[i].lstrip('> ')
-        elif lines[i].startswith(">"):
-            lines[i] = lines[i].replace('>', '', 1)
-
-    output += handle_conversion(lines)
-    output += "</blockquote>\n"
-
-    return output
-
-def handle_ordered_list(lines: list) -> str:
-    """
-    Handles ordered lists
-    :param lines: lines that belong to the ordered list
-    :return: Formatted ordered list as HTML
-    """
-    output = "<ol>\n"
-    skip_lines = 0
-    for i in range(len(lines)):
-        if skip_lines > 0:
-            skip_lines -= 1
-            continue
-        if re.match(r'^\d+\.\s', lines[i]):
-            lines[i] = re.sub(r'^\d+\.\s', '', lines[i], count=1)
-            tokenized_line = tokenize_line(lines[i].rstrip("\n"))
-            tokenized_line[0] = check_for_formatting(tokenized_line[0])
-            formatted_output = detokenize_line(tokenized_line[0], tokenized_line[1])
-            output += f'<li>{formatted_output}</li>\n'
-        elif lines[i].startswith(' '):
-            deeper_lines_ended = False
-            deeper_lines_count = 0
-            deeper_lines = []
-            indent_depth = len(lines[i]) - len(lines[i].lstrip(" "))
-            while not deeper_lines_ended:
-                try:
-                    line = lines[i + deeper_lines_count].replace(' ', '', indent_depth)
-                    deeper_lines.append(line)
-                    deeper_lines_count += 1
-                    if not lines[i + deeper_lines_count].startswith(" "):
-                        deeper_lines_ended = True
-                except IndexError:
-                    deeper_lines_ended = True
-            skip_lines += deeper_lines_count - 1
-            output += handle_conversion(deeper_lines)
-    output += "</ol>\n"
-    return output
-
-def handle_unordered_list(lines: list) -> str:
-    """
-    Handles unordered lists
-    :param lines: lines that belong to the unordered list
-    :return: Formatted unordered list as HTML
-    """
-    output = "<ul>\n"
-    skip_lines = 0
-    for i in range(len(lines)):
-        if skip_lines > 0:
-            skip_lines -= 1
-            continue
-        if re.match(r'^[-*+]\s', lines[i]):
-            lines[i] = re.sub(r'^[-*+]\s', '', lines[i], count=1)
-            tokenized_line = tokenize_line(lines[i].rstrip("\n"))
-            tokenized_line[0] = check_for_formatting(tokenized_line[0])
-            formatted_output = detokenize_line(tokenized_line[0], tokenized_line[1])
-            output += f'<li>{formatted_output}</li>\n'
-        elif lines[i].startswith(' '):
-            deeper_lines_ended = False
-            deeper_lines_count = 0
-            deeper_lines = []
-            indent_depth = len(lines[i]) - len(lines[i].lstrip())
-            while not deeper_lines_ended:
-                try:
-                    line = lines[i + deeper_lines_count].replace(' ', '', indent_depth)
-                    deeper_lines.append(line)
-                    deeper_lines_count += 1
-                    if not lines[i + deeper_lines_count].startswith(" "):
-                        deeper_lines_ended = True
-                except IndexError:
-                    deeper_lines_ended = True
-            skip_lines += deeper_lines_count - 1
-            output += handle_conversion(deeper_lines)
-    output += "</ul>\n"
-    return output
-
-def handle_code_block(lines: list) -> str:
-    """
-    Handles code blocks
-    :param lines: lines that belong to the code block
-    :return: Formatted code block as HTML
-    """
-    output = "<pre><code>\n"
-    for line in lines:
-        if line.startswith('```'):
-            continue
-        output += f"{line.rstrip()}\n"
-    output += "</code></pre>\n"
-    return output
-
-def handle_table(lines: list) -> str:
-    """
-    Handles tables
-    :param lines: lines that belong to the table
-    :return: Formatted table as HTML
-    """
-    output = "<table>\n"
-    column_alignments = []
-    first_header = False
-    if len(lines) < 2:
-        output += "<tr>\n"
-        matches = re.findall(r'(?:\\\||[^|\n])+', lines[0])
-        cell_start = '<td style="text-align: center;">'
-        cell_end = "</td>\n"
-        for j in range(0, len(matches)):
-            output += cell_start
-            cell = tokenize_line(matches[j].strip())
-            cell[0] = check_for_formatting(cell[0])
-            formatted_output = detokenize_line(cell[0], cell[1])
-            output += formatted_output
-            output += cell_end
-        output += "</tr>\n"
-        output += "</table>\n"
-        return output
-    if re.match(r'\| ?(:?-{3,}:?) ?(?:\| ?(:?-{3,}:?) ?)+\|', lines[1]):
-        first_header = True
-        matches = re.finditer(r':?-{3,}:?', lines[1])
-        for match in matches:
-            alignment = match.group(0)
-            if alignment.startswith(':') and alignment.endswith(':'):
-                column_alignments.append('center')
-            elif alignment.startswith(':'):
-                column_alignments.append('left')
-            elif alignment.endswith(':'):
-                column_alignments.append('right')
-            else:
-                column_alignments.append('center') # Default behaviour in many web browsers
-    for i in range(len(lines)):
-        output += "<tr>\n"
-        if i == 1 and first_header:
-            continue
-        matches = re.findall(r'(?:\\\||[^|\n])+', lines[i])
-        if i == 0 and first_header:
-            cell_start = '<th style="text-align: {};">'
-            cell_end = "</th>\n"
-        else:
-            cell_start = '<td style="text-align: {};">'
-            cell_end = "</td>\n"
-        for j in range(0, len(matches)):
-            output += cell_start.format(column_alignments[j] if j < len(column_alignments) else 'center')
-            cell = tokenize_line(matches[j].strip())
-            cell[0] = check_for_formatting(cell[0])
-            formatted_output = detokenize_line(cell[0], cell[1])
-            output += formatted_output
-            output += cell_end
-        output += "</tr>\n"
-    output += "</table>\n"
-    return output
+    sys.stdin.reconfigure(encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    log.info("Converting Markdown from the standard input.")
+    sys.stdout.writelines(convert_stream(sys.stdin))
+    sys.stdout.flush()
+    return 0
 
-def handle_task_list(lines: list) -> str:
-    """
-    Handles task lists
-    :param lines: lines that belong to the task list
-    :return: Formatted task list as HTML
-    """
-    output = ""
-    skip_lines = 0
-    for i in range(len(lines)):
-        if skip_lines > 0:
-            skip_lines -= 1
-            continue
-        if re.match(r'- \[([ x])] (.+)', lines[i]):
-            match = re.match(r'- \[([ x])] (.+)', lines[i])
-            checked = match.group(1) == 'x'
-            if checked:
-                output += '<input type="checkbox" checked disabled> '
-            else:
-                output += '<input type="checkbox" disabled> '
-            content = match.group(2)
-            tokenized_line = tokenize_line(content.strip())
-            tokenized_line[0] = check_for_formatting(tokenized_line[0])
-            formatted_output = detokenize_line(tokenized_line[0], tokenized_line[1])
-            output += f'{formatted_output}<br>\n'
-        elif lines[i].startswith(' '):
-            deeper_lines_ended = False
-            deeper_lines_count = 0
-            deeper_lines = []
-            indent_depth = len(lines[i]) - len(lines[i].lstrip())
-            while not deeper_lines_ended:
-                try:
-                    line = lines[i + deeper_lines_count].replace(' ', '', indent_depth)
-                    deeper_lines.append(line)
-                    deeper_lines_count += 1
-                    if not lines[i + deeper_lines_count].startswith(" "):
-                        deeper_lines_ended = True
-                except IndexError:
-                    deeper_lines_ended = True
-            skip_lines += deeper_lines_count - 1
-            output += "<div style='margin-left: 20px;'>\n"
-            output += handle_conversion(deeper_lines)
-            output += "</div>\n"
-    return output
+def run_command(arguments: list) -> int:
+    """
+    Runs the program non-interactively, based on the command line arguments.
+    :param arguments: command line arguments, without the program name
+    :return: exit code of the command
+    """
+    import argparse
+    from md_to_html.build import build_directory
+
+    parser = argparse.ArgumentParser(prog='main.py', description='Markdown to HTML converter')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='convert every Markdown file in a directory tree')
+    build.add_argument('source', help='directory with the Markdown files')
+    build.add_argument('output', help='directory for the HTML files, the layout of the source is kept')
+    build.add_argument('--jobs', '-j', type=int, default=None, help='number of worker processes (default: CPU count)')
+    build.add_argument('--force', '-f', action='store_true', help='convert all files, even the unchanged ones')
+    build.add_argument('--stats', nargs='?', const='text', choices=('text', 'json'), default=None,
+                       help='print the time spent in every handler, as a table (default) or as JSON')
+
+    serve = commands.add_parser('serve', help='run a local HTTP server converting Markdown sent by POST requests')
+    serve.add_argument('--port', '-p', type=int, default=8000, help='port to listen on, 0 for any free port (default: 8000)')
+    serve.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    serve.add_argument('--jobs', '-j', type=int, default=None, help='number of worker processes (default: CPU count)')
+    serve.add_argument('--cache-size', type=int, default=64, help='size of the cache of rendered documents in MB (default: 64)')
+
+    watch = commands.add_parser('watch', help='build a directory tree, then convert every Markdown file again when it is saved')
+    watch.add_argument('source', help='directory with the Markdown files')
+    watch.add_argument('output', help='directory for the HTML files, the layout of the source is kept')
+    watch.add_argument('--debounce', type=int, default=50, help='milliseconds without a save before converting (default: 50)')
+    watch.add_argument('--poll', action='store_true', help='poll the directory instead of using inotify')
+    watch.add_argument('--interval', type=float, default=0.1, help='seconds between two checks when polling (default: 0.1)')
+
+    args = parser.parse_args(arguments)
+    match args.command:
+        case 'build':
+            return build_directory(args.source, args.output, args.jobs, args.force, args.stats)
+        case 'serve':
+            from md_to_html.server import serve
+            return serve(args.host, args.port, args.jobs, args.cache_size * 1024 * 1024)
+        case 'watch':
+            from md_to_html.watch import watch_directory
+            return watch_directory(args.source, args.output, args.debounce / 1000, args.interval, args.poll)
+    return 2
 
 if __name__ == "__main__":
     """
@@ -767,8 +213,18 @@ if __name__ == "__main__":
     
     :return: 0 - Exit, -1 - Error
     """
+    start_logging()
     log.debug("Program started.")
 
+    # Filter mode: python main.py - < input.md > output.html
+    if sys.argv[1:] == ['-']:
+        exit(convert_stdin_to_stdout())
+    # Batch mode: python main.py build SRC_DIR OUT_DIR --jobs N
+    # Server mode: python main.py serve --port 8000
+    # Watch mode: python main.py watch SRC_DIR OUT_DIR
+    if len(sys.argv) > 1:
+        exit(run_command(sys.argv[1:]))
+
     # Main loop
     while True:
         try:
@@ -0,0 +1,32 @@
+# Markdown to HTML converter by Syhmac
+# Library interface. Importing the package has no side effects: nothing is logged or written
+# until a logger is set with set_logger(), and the batch build is only imported when used.
+#
+#   import md_to_html
+#   html = md_to_html.convert("# Title\n\nSome *text*.\n")
+
+from .converter import (
+    VERSION, convert, convert_file, convert_stream, handle_conversion, RenderCache,
+    parse_lines, iter_nodes, render_html, render_plain_text, list_headings, walk, link_definitions,
+    TableOfContents, render_toc,
+    Node, Text, Rule, Paragraph, Heading, Blockquote, Nested, List, Task, TaskList, Table, CodeBlock,
+    set_inline_cache_size, inline_cache_stats, enable_stats, disable_stats, reset_stats, get_stats, format_stats,
+)
+from .logger import NullLogger, set_logger, get_logger
+from .mapped import MappedLines
+
+__all__ = [
+    'VERSION', 'convert', 'convert_file', 'convert_stream', 'handle_conversion', 'RenderCache',
+    'parse_lines', 'iter_nodes', 'render_html', 'render_plain_text', 'list_headings', 'walk', 'link_definitions',
+    'TableOfContents', 'render_toc',
+    'Node', 'Text', 'Rule', 'Paragraph', 'Heading', 'Blockquote', 'Nested', 'List', 'Task', 'TaskList', 'Table',
+    'CodeBlock', 'set_inline_cache_size', 'inline_cache_stats', 'enable_stats', 'disable_stats', 'reset_stats',
+    'get_stats', 'format_stats', 'NullLogger', 'set_logger', 'get_logger', 'MappedLines', 'build_directory',
+]
+
+def __getattr__(name: str):
+    # The batch build pulls in more modules, so it's imported on first use.
+    if name == 'build_directory':
+        from .build import build_directory
+        return build_directory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,221 @@
+# Batch conversion of directory trees
+# Converts every Markdown file of a directory tree in parallel, skipping the files that didn't change since the last build.
+
+# imports
+import json, os, sys, time
+from . import converter
+from .converter import MARKDOWN_EXTENSIONS, config_hash, converter_version, file_hash, file_state
+from .logger import log
+
+MANIFEST_FILENAME = '.md_to_html_manifest.json'  # stored in the output directory
+CHUNK_BYTES = 256 * 1024  # files are sent to the worker processes in chunks of about this size...
+CHUNK_FILES = 64  # ...or this many files, whichever comes first
+
+def build_directory(source_dir: str, output_dir: str, jobs: int = None, force: bool = False, stats: str = None) -> int:
+    """
+    Converts every Markdown file found in the source directory tree to HTML in the output directory.
+    Files are grouped into chunks of similar total size and the chunks are converted on a process pool.
+    Files that didn't change since the last build (according to the manifest in the output directory) are skipped,
+    and outputs of deleted sources are removed.
+    :param source_dir: directory with the Markdown files
+    :param output_dir: directory for the HTML files
+    :param jobs: number of worker processes, CPU count when not given
+    :param force: convert all files, ignoring the manifest
+    :param stats: print the handler statistics, 'text' or 'json'. Not collected when None.
+    :return: 0 - Success, 1 - Some files failed
+    """
+    if not os.path.isdir(source_dir):
+        log.error(f"Source directory does not exist: {source_dir}")
+        print(f"Source directory does not exist: {source_dir}", file=sys.stderr)
+        return 1
+    jobs = jobs or os.cpu_count() or 1
+    start_time = time.perf_counter()
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    manifest = load_manifest(manifest_path)
+    current_config_hash = config_hash()
+    version = converter_version()
+    if force or manifest['version'] != version or manifest['config_hash'] != current_config_hash:
+        previous_entries = manifest['files']
+        entries = {}
+    else:
+        previous_entries = manifest['files']
+        entries = dict(previous_entries)
+
+    files = find_markdown_files(source_dir)
+    sources = set()
+    tasks = []
+    for path, size, mtime in files:
+        sources.add(path)
+        input_path = os.path.join(source_dir, path)
+        output_path = os.path.join(output_dir, os.path.splitext(path)[0] + '.html')
+        if is_up_to_date(entries.get(path), input_path, output_path, size, mtime):
+            entries[path]['mtime'] = mtime
+            continue
+        tasks.append((input_path, output_path, size))
+    skipped = len(files) - len(tasks)
+    log.info(f"Building {len(tasks)} files from {source_dir} to {output_dir} with {jobs} jobs, {skipped} unchanged.")
+
+    # Outputs whose source is gone are removed.
+    pruned = 0
+    for path in previous_entries.keys() - sources:
+        output_path = os.path.join(output_dir, os.path.splitext(path)[0] + '.html')
+        if os.path.exists(output_path):
+            os.remove(output_path)
+            pruned += 1
+        entries.pop(path, None)
+
+    results = []
+    build_stats = {}
+    collect_stats = stats is not None
+    if jobs == 1 or len(tasks) < 2:
+        results, build_stats = convert_chunk(tasks, collect_stats)
+    else:
+        # Imported here, as the process pool is only needed by parallel builds and is slow to import.
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunks = chunk_tasks(tasks, jobs)
+            for chunk_results, chunk_stats in executor.map(convert_chunk, chunks, [collect_stats] * len(chunks)):
+                results.extend(chunk_results)
+                converter.merge_stats(build_stats, chunk_stats)
+
+    failures = []
+    for (input_path, _, _), (state, error) in zip(tasks, results):
+        path = os.path.relpath(input_path, source_dir)
+        if error is not None:
+            failures.append((input_path, error))
+            entries.pop(path, None)
+        else:
+            size, mtime, digest = state
+            entries[path] = {'size': size, 'mtime': mtime, 'hash': digest}
+    save_manifest(manifest_path, {'version': version, 'config_hash': current_config_hash, 'files': entries})
+
+    elapsed = time.perf_counter() - start_time
+    converted = len(tasks) - len(failures)
+    for path, error in failures:
+        log.error("Failed to convert %s: %s", path, error)
+        print(f"FAILED {path}: {error}", file=sys.stderr)
+    print(f"Converted {converted} files in {elapsed:.2f} s ({converted / elapsed if elapsed else 0:.1f} files/s), "
+          f"{skipped} unchanged, {pruned} removed, {len(failures)} failed.")
+    if stats == 'json':
+        print(json.dumps(build_stats, indent=1, sort_keys=True))
+    elif stats == 'text':
+        print(converter.format_stats(build_stats))
+    return 1 if failures else 0
+
+def is_up_to_date(entry: dict, input_path: str, output_path: str, size: int, mtime: int) -> bool:
+    """
+    Checks if the output of a file recorded in the manifest is still valid.
+    Size and modification time are compared first. The content hash is only computed when the file was touched.
+    :param entry: manifest entry of the file, None if it's not in the manifest
+    :param input_path: path to the Markdown file
+    :param output_path: path to the HTML file
+    :param size: current size of the Markdown file
+    :param mtime: current modification time of the Markdown file in nanoseconds
+    :return: True if the file doesn't need to be converted again
+    """
+    if entry is None or entry['size'] != size or not os.path.exists(output_path):
+        return False
+    if entry['mtime'] == mtime:
+        return True
+    return file_hash(input_path) == entry['hash']
+
+def load_manifest(path: str) -> dict:
+    """
+    Loads the build manifest. A missing or unreadable manifest is treated as empty.
+    :param path: path to the manifest file
+    :return: manifest with 'version', 'config_hash' and 'files' keys
+    """
+    empty = {'version': None, 'config_hash': None, 'files': {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        if not isinstance(manifest.get('files'), dict):
+            raise ValueError("missing list of files")
+    except (OSError, ValueError) as e:
+        log.warn(f"Ignoring invalid build manifest {path}: {e}")
+        return empty
+    return {'version': manifest.get('version'), 'config_hash': manifest.get('config_hash'), 'files': manifest['files']}
+
+def save_manifest(path: str, manifest: dict) -> None:
+    """
+    Saves the build manifest, replacing the previous one at once.
+    :param path: path to the manifest file
+    :param manifest: manifest with 'version', 'config_hash' and 'files' keys
+    :return: None
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def find_markdown_files(source_dir: str) -> list:
+    """
+    Walks the source directory tree and finds all Markdown files.
+    :param source_dir: directory to walk
+    :return: list of (path relative to the source directory, size in bytes, modification time in nanoseconds)
+    """
+    files = []
+    for directory, subdirectories, filenames in os.walk(source_dir):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(MARKDOWN_EXTENSIONS):
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                files.append((os.path.relpath(path, source_dir), stat.st_size, stat.st_mtime_ns))
+    return files
+
+def chunk_tasks(tasks: list, jobs: int) -> list:
+    """
+    Groups conversion tasks into chunks, so small files don't pay for inter-process communication one by one.
+    A chunk is closed when it reaches CHUNK_BYTES or CHUNK_FILES, or its share of the whole build,
+    so every worker still gets several chunks to balance the load.
+    :param tasks: list of (input path, output path, size) tuples
+    :param jobs: number of worker processes
+    :return: list of chunks, each being a list of tasks
+    """
+    total_size = sum(task[2] for task in tasks)
+    chunk_bytes = max(1, min(CHUNK_BYTES, total_size // (jobs * 4)))
+    chunks = []
+    chunk = []
+    chunk_size = 0
+    for task in tasks:
+        chunk.append(task)
+        chunk_size += task[2]
+        if chunk_size >= chunk_bytes or len(chunk) >= CHUNK_FILES:
+            chunks.append(chunk)
+            chunk = []
+            chunk_size = 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def convert_chunk(tasks: list, collect_stats: bool = False) -> tuple:
+    """
+    Converts a chunk of files. Runs in the worker processes of build_directory().
+    :param tasks: list of (input path, output path, size) tuples
+    :param collect_stats: collect the handler statistics while converting the chunk
+    :return: (results, stats). Results are (state, error message) for every task, where the state is
+    (size, modification time, content hash) of the file read before it was converted, see file_state().
+    The state is None when the conversion failed and the error is None when it succeeded.
+    Stats are the handler statistics of the chunk, empty when not collected.
+    """
+    if collect_stats:
+        converter.enable_stats()
+    results = []
+    try:
+        for input_path, output_path, _ in tasks:
+            try:
+                state = file_state(input_path)
+                # Looked up on the module, so the measuring wrapper is called while the statistics are enabled.
+                converter.convert_file(input_path, output_path)
+                results.append((state, None))
+            except Exception as e:
+                results.append((None, f"{type(e).__name__}: {e}"))
+    finally:
+        chunk_stats = converter.get_stats() if collect_stats else {}
+        if collect_stats:
+            converter.disable_stats()
+    return results, chunk_stats
@@ -0,0 +1,2167 @@
+# Markdown to HTML conversion
+# Parses Markdown to a document tree and renders it as HTML. Importing this module has no side effects.
+
+# imports
+import functools, itertools, os, re, time
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Iterable, Iterator
+from .logger import log
+
+# Instrumentation, see enable_stats()
+INSTRUMENTED_FUNCTIONS = (
+    'convert_file', 'handle_conversion', 'iter_html', 'classify_line', 'parse_blocks', 'parse_header',
+    'parse_blockquote', 'parse_table', 'parse_table_rows', 'parse_task_list',
+    'parse_ordered_list', 'parse_unordered_list', 'parse_code_block', 'parse_code_lines',
+    'render_paragraph', 'render_heading', 'render_list', 'render_table', 'iter_table_html', 'render_task_list',
+    'render_code_block', 'iter_code_html', 'render_text', 'tokenize_line', 'check_for_formatting', 'detokenize_line',
+)
+PATH_INPUT_FUNCTIONS = ('convert_file',)  # instrumented functions whose input is a file path, see measure_path()
+STREAM_INPUT_FUNCTIONS = ('iter_html',)  # instrumented generators whose input is any iterable of lines, see LineCounter
+GENERATOR_FLAG = 0x20  # inspect.CO_GENERATOR, the flag of the generator functions, without importing inspect
+STATS_FIELDS = ('calls', 'total', 'max', 'lines', 'bytes')
+STATS = {}  # function name -> [calls, total seconds, max seconds, lines, bytes]
+ORIGINAL_FUNCTIONS = {}  # function name -> function replaced by its wrapper while the statistics are enabled
+STATS_INLINE_CACHE_SIZE = 0  # size of the inline memo when the statistics were enabled, put back by disable_stats()
+
+# Converter version, stored in the build manifest with a hash of the converter source, see converter_version().
+# Outputs of other versions are converted again.
+VERSION = '1.0'
+CONVERTER_SOURCES = ('converter.py', 'mapped.py')  # modules of this package that decide the output HTML
+CONFIG_PATH = 'md_to_html_config.json'
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+
+# HTML elements that can get CSS classes in the configuration: {"classes": {"p": "lead", "table": "data striped"}}
+CONFIG_ELEMENTS = ('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'blockquote', 'ul', 'ol', 'li',
+                   'table', 'tr', 'th', 'td', 'pre', 'code', 'input', 'div')
+LOADED_CONFIG = {}  # configuration path -> (modification time, size, tag table), see load_tags()
+
+# Indices in the tag table made by compile_tags(). Every entry is a pair of finished (opening, closing) tags.
+TAG_P = 0
+# 1 to 6 are the headers, indexed by their level
+TAG_HR = 7  # the closing tag is empty
+TAG_BLOCKQUOTE = 8
+TAG_UL = 9
+TAG_OL = 10
+TAG_LI = 11
+TAG_TABLE = 12
+TAG_TR = 13
+TAG_TH = 14  # the alignment of the column is added by column_tags()
+TAG_TD = 15
+TAG_CODE = 16  # <pre><code> of a code block without a language
+TAG_CODE_LANGUAGE = 17  # <pre><code> of a code block with a language, which is written between the two parts
+TAG_CHECKED = 18  # checkbox of a done task, closed by a line break
+TAG_UNCHECKED = 19
+TAG_NESTED_TASKS = 20  # blocks nested in a task list
+
+# Inline patterns used by tokenize_line(). Compiled once, each of them is applied in a single pass over the line.
+ESCAPE_PATTERN = re.compile(r'\\([\\`*_{}\[\]<>()#+\-.!=~|])')  # backslash followed by an escapable character
+# The text of a link or image may hold balanced brackets, but no unmatched one, so it never starts at an earlier,
+# unrelated '[' (e.g. of a reference to an undefined label). Every character has one way to match, which keeps it linear.
+LINK_TEXT = r'\[(?!])([^\[\]]*(?:\[[^\[\]]*][^\[\]]*)*)]'
+IMAGE_PATTERN = re.compile(r'!' + LINK_TEXT + r'\((.+?)\)')  # ![alt](src)
+LINK_PATTERN = re.compile(LINK_TEXT + r'\((.+?)\)')  # [text](url)
+AUTOLINK_PATTERN = re.compile(r'<([^>]+?@[^>]+?)>|<(.+?)>')  # <e-mail> is preferred over <url>
+# [text][label], [label][] or [label], resolved by resolve_references(). Code spans are matched to be skipped.
+REFERENCE_PATTERN = re.compile(r'(?<!`)(`+)(?!`).+?(?<!`)\1(?!`)|(?<!\\)(!?)\[([^\[\]]+)](?:\[([^\[\]]*)])?(?![(:])')
+
+# Tokens replace parts of the line that must not be formatted. Private-use characters can't be confused with Markdown.
+TOKEN_START = '\ue000'
+TOKEN_END = '\ue001'
+TOKEN_PATTERN = re.compile(TOKEN_START + r'(\d+)' + TOKEN_END)
+TOKEN_MARKER_PATTERN = re.compile(f'[{TOKEN_START}{TOKEN_END}]')
+INLINE_MARKUP_PATTERN = re.compile(f'[\\\\`*_~^=<\\]{TOKEN_START}{TOKEN_END}]')  # stripped text without it is its own HTML
+
+# Formatting delimiters used by check_for_formatting(), with the tags produced for each run length they support.
+FORMATTING_TAGS = {
+    '*': {3: ('<b><i>', '</i></b>'), 2: ('<b>', '</b>'), 1: ('<i>', '</i>')},
+    '_': {3: ('<b><i>', '</i></b>'), 2: ('<b>', '</b>'), 1: ('<i>', '</i>')},
+    '~': {2: ('<s>', '</s>'), 1: ('<sub>', '</sub>')},
+    '^': {1: ('<sup>', '</sup>')},
+    '=': {2: ('<mark>', '</mark>')},
+}
+DELIMITER_PATTERN = re.compile(r'`+|\*+|_+|~+|\^+|=+')
+CODE_SPAN_PATTERNS = {}  # backtick run length -> compiled pattern, filled by code_span_pattern()
+INLINE_CACHE_SIZE = 8192  # default number of inline texts memoized by render_inline()
+
+# Line kinds assigned by classify_line()
+LINE_TEXT = 0
+LINE_BLANK = 1
+LINE_HEADER = 2
+LINE_QUOTE = 3
+LINE_TABLE = 4
+LINE_TABLE_RULE = 5  # '|:' or '|-' - continues a table, but doesn't start one
+LINE_TASK = 6
+LINE_ORDERED_START = 7  # '1. ' - starts an ordered list
+LINE_ORDERED = 8  # any other number - continues an ordered list, but doesn't start one
+LINE_UNORDERED = 9
+LINE_FENCE = 10
+LINE_RULE = 11
+LINE_INDENTED = 12
+LINE_DEFINITION = 13  # '[label]: url' at the top level - a link definition, removed from the blocks
+LINE_PARSED = -1  # not a line: a block parsed beforehand, passed in place of the lines (see iter_quote_blocks())
+LINE_TABLE_PART = -2  # not a line: lines of a table split by iter_blocks(), more lines of the table follow
+LINE_FENCE_PART = -3  # not a line: lines of a code block split by iter_blocks(), more lines of the block follow
+PART_LINES = 1024  # maximum number of lines of a table or code block parsed at once by convert_stream()
+HELD_NODES = 1024  # maximum number of top-level nodes convert_stream() holds back for the definitions of their links
+LOOKAHEAD_PREFIXES = ('```', '#', '[')  # starts of the only lines scan_lookahead() needs: fences, headers, definitions
+
+# Kinds that start a multi-line block, with the kinds of lines that continue it
+BLOCK_CONTINUATIONS = {
+    LINE_QUOTE: frozenset((LINE_QUOTE,)),
+    LINE_TABLE: frozenset((LINE_TABLE, LINE_TABLE_RULE)),
+    LINE_TASK: frozenset((LINE_TASK, LINE_INDENTED)),
+    LINE_ORDERED_START: frozenset((LINE_ORDERED_START, LINE_ORDERED, LINE_INDENTED)),
+    LINE_UNORDERED: frozenset((LINE_UNORDERED, LINE_TASK, LINE_INDENTED)),
+    LINE_FENCE: frozenset(),  # ends with the next fence, see iter_blocks()
+}
+
+# Block patterns
+TASK_PATTERN = re.compile(r'- \[([ x])] (.+)')
+ORDERED_ITEM_PATTERN = re.compile(r'\d+\.\s')
+UNORDERED_ITEM_PATTERN = re.compile(r'[-*+]\s')
+RULE_PATTERN = re.compile(r'(\*{3,}|-{3,}|_{3,})\s*\n')
+QUOTE_MARKER_PATTERN = re.compile(r'> ?')
+QUOTE_MARKERS_PATTERN = re.compile(r'(?:> ?)*')
+LEADING_SPACES_PATTERN = re.compile(r' *')
+LEADING_WHITESPACE_PATTERN = re.compile(r'\s*')
+# [label]: url "optional title" - the title is accepted, but not rendered
+DEFINITION = r'\[([^\]\n]+)]:[ \t]*(<[^>\s]*>|\S+)(?:[ \t]+(?:"[^"\n]*"|\'[^\'\n]*\'|\([^)\n]*\)))?[ \t]*'
+DEFINITION_PATTERN = re.compile(DEFINITION + '$')
+TABLE_RULE_PATTERN = re.compile(r'\| ?(:?-{3,}:?) ?(?:\| ?(:?-{3,}:?) ?)+\|')
+TABLE_ALIGNMENT_PATTERN = re.compile(r':?-{3,}:?')
+TABLE_CELL_PATTERN = re.compile(r'(?:\\\||[^|\n])+')  # a cell may contain an escaped pipe
+INLINE_TAG_PATTERN = re.compile(r'</?(?:b|i|s|sub|sup|mark|code|a|img)\b[^>]*>|<br>')  # removed by plain_inline()
+HEADER_ID_PATTERN = re.compile(r'[ \t]+\{#([\w.:-]+)}[ \t]*$')  # '## Title {#id}' - explicit id of a header
+SLUG_REMOVED_PATTERN = re.compile(r'[^\w\- ]')  # characters left out of the ids made from the text of headers
+
+def convert(text: str, *, config: dict = None, toc: 'TableOfContents' = None, with_toc: bool = False):
+    """
+    Converts a Markdown document to HTML.
+    :param text: Markdown document. Line endings are normalized to \\n, as when reading a file.
+    :param config: configuration in the format of md_to_html_config.json, used instead of the configuration file
+    :param toc: table of contents the headers are added to while the document is converted, see render_toc()
+    :param with_toc: return the table of contents as well
+    :return: output HTML as a string, or (HTML, TableOfContents) with with_toc
+    """
+    tags = config_tags(config)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    # Every line but the last one keeps its line break, the same as lines read from a file.
+    last = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last:
+        lines.append(last)
+    if with_toc and toc is None:
+        toc = TableOfContents()
+    html = handle_conversion(lines, tags, toc)
+    return (html, toc) if with_toc else html
+
+def config_tags(config: dict) -> tuple:
+    """
+    Checks the configuration passed to the public functions and compiles it to a tag table.
+    :param config: configuration dictionary, or None for the configuration file
+    :return: tag table, see compile_tags()
+    """
+    if config is None:
+        return load_tags()
+    if not isinstance(config, dict):
+        raise TypeError(f"config must be a dict, not {type(config).__name__}")
+    return compile_tags(config_classes(config))
+
+def load_tags(path: str = CONFIG_PATH) -> tuple:
+    """
+    Returns the tag table of a configuration file.
+    The file is read, checked and compiled once, and read again only when its modification time or size changes.
+    :param path: path to the configuration file
+    :return: tag table, see compile_tags(). DEFAULT_TAGS if there is no configuration file.
+    """
+    try:
+        status = os.stat(path)
+    except FileNotFoundError:
+        return DEFAULT_TAGS
+    loaded = LOADED_CONFIG.get(path)
+    if loaded is not None and loaded[0] == status.st_mtime_ns and loaded[1] == status.st_size:
+        return loaded[2]
+    import json  # only needed when there is a configuration file
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            config = json.load(file)
+    except ValueError as e:
+        raise ValueError(f"Invalid configuration file {path}: {e}") from None
+    if not isinstance(config, dict):
+        raise ValueError(f"Invalid configuration file {path}: expected a JSON object")
+    tags = compile_tags(config_classes(config))
+    LOADED_CONFIG[path] = (status.st_mtime_ns, status.st_size, tags)
+    log.info(f"Configuration loaded from {path}")
+    return tags
+
+def config_classes(config: dict) -> dict:
+    """
+    Checks a configuration and returns its CSS classes.
+    :param config: configuration in the format of md_to_html_config.json
+    :return: dictionary: element -> CSS classes
+    """
+    unknown = [key for key in config if key != 'classes']
+    if unknown:
+        raise ValueError(f"Unknown configuration keys: {', '.join(map(repr, unknown))}")
+    classes = config.get('classes', {})
+    if not isinstance(classes, dict):
+        raise ValueError("'classes' must map HTML elements to CSS classes")
+    for element, css in classes.items():
+        if element not in CONFIG_ELEMENTS:
+            raise ValueError(f"Unknown element {element!r} in the configuration, expected one of: {', '.join(CONFIG_ELEMENTS)}")
+        if not isinstance(css, str):
+            raise ValueError(f"CSS classes of {element!r} must be a string, not {type(css).__name__}")
+    return classes
+
+def default_config() -> dict:
+    """
+    Makes the default configuration, written when there is no configuration file.
+    :return: configuration without any CSS class
+    """
+    return {'classes': dict.fromkeys(CONFIG_ELEMENTS, "")}
+
+def convert_file(input_path: str, output_path: str, *, config: dict = None, mapped: bool = False,
+                 toc: 'TableOfContents' = None) -> None:
+    """
+    Converts a Markdown file to an HTML file, creating the output directory if needed.
+    :param input_path: path to the Markdown file
+    :param output_path: path to the HTML file
+    :param config: configuration, see convert()
+    :param mapped: read the file through a memory map, see MappedLines. Off by default: streaming the open file
+    uses less memory, as the index of a mapped file takes 8 bytes for every line.
+    :param toc: table of contents the headers are added to, see convert()
+    :return: None
+    """
+    tags = config_tags(config)
+    if toc is None:
+        toc = TableOfContents()
+    output_directory = os.path.dirname(output_path)
+    if output_directory:
+        os.makedirs(output_directory, exist_ok=True)
+    # The HTML is written to a temporary file first, so a failed conversion never leaves a partial output behind.
+    temporary_path = output_path + '.tmp'
+    try:
+        if mapped:
+            from .mapped import MappedLines
+            input_file = MappedLines(input_path)
+        else:
+            input_file = open(input_path, 'r', encoding='utf-8')
+        with input_file, open(temporary_path, 'w', encoding='utf-8') as output_file:
+            # Unlike a stream, a file can be scanned ahead, so it's converted the same way as by handle_conversion().
+            if mapped:
+                links = scan_lookahead(input_file.iter_lines_starting_with(LOOKAHEAD_PREFIXES), toc)
+            else:
+                links = scan_lookahead(input_file, toc)
+                input_file.seek(0)
+            output_file.writelines(iter_html(input_file, tags, links, toc))
+        os.replace(temporary_path, output_path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+def file_hash(path: str) -> str:
+    """
+    Computes the content hash of a file.
+    :param path: path to the file
+    :return: hexadecimal SHA-256 digest
+    """
+    return file_state(path)[2]
+
+def file_state(path: str) -> tuple:
+    """
+    Reads the size, modification time and content hash of a file from the same open file, so they all
+    describe the same version of it. The status is taken before the content is read: when the file is changed
+    meanwhile, its modification time differs from the one returned, and its hash is checked again.
+    :param path: path to the file
+    :return: (size in bytes, modification time in nanoseconds, hexadecimal SHA-256 digest)
+    """
+    import hashlib  # only needed by builds and caches, it's slow to import
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        status = os.fstat(file.fileno())
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return status.st_size, status.st_mtime_ns, digest.hexdigest()
+
+def converter_version() -> str:
+    """
+    Makes the converter version stored in the build manifest: VERSION and the hash of the source of the converter,
+    so outputs are converted again after any change of the code, even when VERSION wasn't bumped.
+    The configuration is hashed on its own, see config_hash().
+    :return: VERSION, followed by the start of the hexadecimal digest of the source when it can be read
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        for filename in CONVERTER_SOURCES:
+            with open(os.path.join(directory, filename), 'rb') as file:
+                digest.update(file.read())
+    except OSError:
+        return VERSION
+    return f"{VERSION}+{digest.hexdigest()[:16]}"
+
+def config_hash() -> str:
+    """
+    Computes the hash of the configuration file, as the configuration changes the output of every file.
+    :return: hexadecimal digest of the configuration file, None if there is no configuration file
+    """
+    if not os.path.exists(CONFIG_PATH):
+        return None
+    return file_hash(CONFIG_PATH)
+
+class RenderCache:
+    """
+    Cache of rendered HTML for repeated conversions of the same, slightly edited, document (e.g. a live preview).
+    The document is split into top-level segments, and the HTML of every segment is kept in a bounded LRU,
+    keyed by the hash of its lines. Only the segments that changed are rendered again.
+    The segments are rendered with the configuration file and the link definitions of the document,
+    and dropped when either of them changes. Segments with headers are rendered every time,
+    as the ids of the headers depend on the headers before them.
+    """
+
+    def __init__(self, max_segments: int = 4096) -> None:
+        """
+        Initialize the cache.
+        :param max_segments: maximum number of segments kept in the cache
+        :return: None
+        """
+        self.max_segments = max_segments
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        import hashlib
+        self.__segments = OrderedDict()  # segment hash -> HTML, the least recently used first
+        self.__tags = None  # tag table the segments were rendered with
+        self.__links = {}  # link definitions the segments were rendered with
+        self.__hasher = hashlib.blake2b(f"{VERSION}\n".encode(), digest_size=16)
+
+    def convert(self, lines: list, toc: 'TableOfContents' = None) -> str:
+        """
+        Converts Markdown lines to HTML, reusing the HTML of unchanged segments.
+        The lines are not modified.
+        :param lines: Markdown lines
+        :param toc: table of contents the headers are added to, see convert()
+        :return: output HTML as a string
+        """
+        if toc is None:
+            toc = TableOfContents()
+        tags = load_tags()
+        kinds = classify_lines(lines)
+        links = collect_link_definitions(lines, kinds)
+        reserve_header_ids(toc, lines, kinds)
+        if tags is not self.__tags or links != self.__links:
+            self.__segments.clear()
+            self.__tags = tags
+            self.__links = links
+        output = []
+        segments = self.__segments
+        for start, end, blocks in iter_segments(lines, kinds):
+            hasher = self.__hasher.copy()
+            hasher.update("".join(lines[start:end]).encode())
+            key = hasher.digest()
+            html = segments.get(key)
+            if html is not None:
+                self.hits += 1
+                segments.move_to_end(key)
+            else:
+                self.misses += 1
+                segment_output = []
+                headers = len(toc.entries)
+                render_html(parse_blocks(blocks), segment_output, tags, links, toc)
+                html = "".join(segment_output)
+                if len(toc.entries) != headers:
+                    output.append(html)
+                    continue
+                segments[key] = html
+                if len(segments) > self.max_segments:
+                    segments.popitem(last=False)
+                    self.evictions += 1
+            output.append(html)
+        return "".join(output)
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+        :return: dictionary with hits, misses, evictions, size and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.__segments),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self) -> None:
+        """
+        Removes all segments from the cache and resets the counters.
+        :return: None
+        """
+        self.__segments.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+class TableOfContents:
+    """
+    Headers of a document, collected while it's rendered, and the ids given to them.
+    The id of a header is made from its text, unless it's set with {#id}. The explicit ids known before rendering
+    are reserved, so an id made from a text never takes them. Any id that is already taken or reserved for
+    another header is numbered, e.g. usage, usage-1, usage-2, and the last number of every id is kept,
+    so a new id is found without searching from the start.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty table of contents.
+        :return: None
+        """
+        self.entries = []  # (level, id, plain text) of every header, in the order of the document
+        self.__taken = set()  # ids given to the headers
+        self.__numbers = {}  # id -> last number appended to it
+        self.__reserved = {}  # explicit id -> number of the headers it's still reserved for
+
+    def reserve(self, anchor: str) -> None:
+        """
+        Reserves the explicit id of a header that is added later.
+        :param anchor: id set with {#id}
+        :return: None
+        """
+        self.__reserved[anchor] = self.__reserved.get(anchor, 0) + 1
+
+    def add(self, level: int, text: str, anchor: str = None) -> str:
+        """
+        Adds a header and gives it an id.
+        :param level: level of the header
+        :param text: plain text of the header
+        :param anchor: explicit id of the header, None to make one from the text
+        :return: id of the header
+        """
+        taken = self.__taken
+        reserved = self.__reserved
+        if anchor is None:
+            anchor = SLUG_REMOVED_PATTERN.sub('', text.lower()).strip().replace(' ', '-') or 'section'
+            blocked = anchor in taken or anchor in reserved
+        else:
+            # The header takes its reservation back. Of the headers with the same explicit id, the first one gets it.
+            if anchor in reserved:
+                if reserved[anchor] == 1:
+                    del reserved[anchor]
+                else:
+                    reserved[anchor] -= 1
+            blocked = anchor in taken
+        if blocked:
+            base = anchor
+            number = self.__numbers.get(base, 0)
+            while anchor in taken or anchor in reserved:
+                number += 1
+                anchor = f"{base}-{number}"
+            self.__numbers[base] = number
+        taken.add(anchor)
+        self.entries.append((level, anchor, text))
+        return anchor
+
+class Node:
+    """
+    Base of the document tree nodes. Nodes only hold data, parsing and rendering are done by functions.
+    Every node pickles as its class and a tuple of its fields, so trees are cheap to send between processes.
+    """
+    __slots__ = ()
+
+    def __init__(self, *fields) -> None:
+        for name, value in zip(self.__slots__, fields):
+            setattr(self, name, value)
+
+    def __reduce__(self) -> tuple:
+        return self.__class__, tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and self.__reduce__() == other.__reduce__()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(repr(getattr(self, name)) for name in self.__slots__)
+        return f"{self.__class__.__name__}({fields})"
+
+class Text(Node):
+    """Inline Markdown (formatting, links, images, escapes), kept as source and rendered by render_inline()."""
+    __slots__ = ('source',)
+
+    def __init__(self, source: str) -> None:
+        self.source = source  # the most common node, so it doesn't go through the loop of Node.__init__()
+
+class Rule(Node):
+    """Horizontal rule."""
+    __slots__ = ()
+
+class Paragraph(Node):
+    """Paragraph. Children are the Text of every line and the Rules found between them."""
+    __slots__ = ('children',)
+
+class Heading(Node):
+    """
+    Header. It stays open until a blank line, so the blocks that follow it are its children.
+    The anchor is the id set with {#id}, None when the id is made from the text.
+    """
+    __slots__ = ('level', 'text', 'children', 'anchor')
+
+class Blockquote(Node):
+    """Blockquote with the blocks found inside it."""
+    __slots__ = ('children',)
+
+class Nested(Node):
+    """Blocks indented under a list item."""
+    __slots__ = ('children',)
+
+class List(Node):
+    """Ordered or unordered list. Items are the Text of every list item, or Nested blocks."""
+    __slots__ = ('ordered', 'items')
+
+class Task(Node):
+    """Task list item."""
+    __slots__ = ('checked', 'text')
+
+class TaskList(Node):
+    """Task list. Items are Tasks or Nested blocks."""
+    __slots__ = ('items',)
+
+class Table(Node):
+    """
+    Table. Rows are lists of Text cells. With a header, the first row is the header and alignments are set.
+    The rows of a table split by iter_blocks() are an iterator, which reads the table as it's iterated.
+    """
+    __slots__ = ('header', 'alignments', 'rows')
+
+class CodeBlock(Node):
+    """Fenced code block. The info string is the text after the opening fence."""
+    __slots__ = ('info', 'lines')
+
+def handle_conversion(lines: list, tags: tuple = None, toc: TableOfContents = None) -> str:
+    """
+    Handles the conversion of Markdown lines to HTML.
+    :param lines:
+    :param tags: tag table, see compile_tags(). None for the tags of the configuration file.
+    :param toc: table of contents the headers are added to, see convert()
+    :return: output HTML as a string
+    """
+    if toc is None:
+        toc = TableOfContents()
+    kinds = classify_lines(lines)
+    reserve_header_ids(toc, lines, kinds)
+    output = []
+    render_html(parse_blocks(iter_line_blocks(lines, kinds)), output, tags, collect_link_definitions(lines, kinds), toc)
+    return "".join(output)
+
+def convert_stream(lines: Iterable[str], *, config: dict = None, links: dict = None,
+                   toc: TableOfContents = None) -> Iterator[str]:
+    """
+    Converts Markdown lines to HTML lazily.
+    Lines are read only as far as the current block, and the HTML is yielded as soon as a top-level block
+    (paragraph, header, table, list, code block...) is closed, so memory use is bound by the largest block.
+    :param lines: any iterable of Markdown lines, e.g. an open file
+    :param config: configuration, see convert()
+    :param links: link definitions of the whole document, e.g. from link_definitions(). Without them, the
+    definitions are collected as they are read, see iter_html(), and a shortcut reference [label] is resolved
+    only when it comes after its definition. convert_file() scans the file for them ahead of the conversion.
+    :param toc: table of contents the headers are added to as they are converted, see convert()
+    :return: iterator of HTML chunks
+    """
+    # Not a generator itself, so the configuration is checked when the function is called.
+    return iter_html(lines, config_tags(config), links, toc)
+
+def iter_html(lines: Iterable[str], tags: tuple, links: dict = None, toc: TableOfContents = None) -> Iterator[str]:
+    """
+    Converts Markdown lines to HTML lazily, see convert_stream().
+    Without the link definitions, they are collected as the blocks are read. A top-level node with a reference
+    to a label that isn't defined yet (see undefined_labels()) is held back, with the nodes after it, until the label is defined,
+    so only the blocks waiting for a definition are kept in memory. The nodes still waiting are rendered
+    when the input ends, when more than HELD_NODES are held, and before a table or code block split into parts.
+    :param lines: any iterable of Markdown lines
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the whole document, None to collect them as they are read
+    :param toc: table of contents the headers are added to
+    :return: iterator of HTML chunks
+    """
+    if toc is None:
+        toc = TableOfContents()
+    blocks = iter_stream_blocks(lines)
+    held = None  # (node, labels it waits for) of the nodes held back, in the order of the document
+    if links is None:
+        links = {}
+        blocks = iter_definition_blocks(blocks, links)
+        held = deque()
+    output = []
+    for node in parse_blocks(blocks):
+        # A long table or code block is rendered part by part, as it's read, so it can't wait.
+        split = (type(node) is Table and type(node.rows) is not list
+                 or type(node) is CodeBlock and type(node.lines) is not list)
+        if held is not None:
+            queued = False  # the node is rendered from the queue, even when it leaves it right away
+            if not split:
+                labels = undefined_labels(node, links)
+                if labels or held:
+                    held.append((node, labels))
+                    queued = True
+            # The nodes whose labels are all defined now are rendered, in order.
+            while held and (split or len(held) > HELD_NODES or links.keys() >= held[0][1]):
+                render_node(held.popleft()[0], output, tags, links, toc)
+            if output:
+                yield "".join(output)
+                output.clear()
+            if queued:
+                continue
+        if type(node) is Table and split:
+            yield from iter_table_html(node, tags, links)
+        elif split:
+            yield from iter_code_html(node, tags)
+        else:
+            render_node(node, output, tags, links, toc)
+            yield "".join(output)
+            output.clear()
+    if held:
+        for node, _ in held:
+            render_node(node, output, tags, links, toc)
+        yield "".join(output)
+
+def undefined_labels(node: Node, links: dict) -> set:
+    """
+    Finds the references to labels that aren't defined yet, in the text of a node and of its descendants.
+    Only [text][label] and [label][] count: a shortcut [label] is as often plain text in brackets
+    (e.g. '## [Unreleased]' of a changelog), so it's resolved only when its label is already defined.
+    :param node: document tree node
+    :param links: link definitions read so far
+    :return: set of the normalized labels
+    """
+    labels = set()
+    for text in iter_texts(node):
+        if "[" in text:
+            for match in REFERENCE_PATTERN.finditer(text):
+                if match.group(4) is not None:
+                    label = normalize_label(match.group(4) or match.group(3))
+                    if label not in links:
+                        labels.add(label)
+    return labels
+
+def iter_texts(node: Node) -> Iterator[str]:
+    """
+    Iterates over the inline Markdown of a node and its descendants.
+    :param node: document tree node, with the rows of a table as a list
+    :return: iterator of the sources of the Text nodes
+    """
+    for child in walk((node,)):
+        child_type = type(child)
+        if child_type is Paragraph:
+            yield from (text.source for text in child.children if type(text) is Text)
+        elif child_type is Heading or child_type is Task:
+            yield child.text.source
+        elif child_type is List:
+            yield from (item.source for item in child.items if type(item) is Text)
+        elif child_type is Table:
+            for row in child.rows:
+                yield from (cell.source for cell in row)
+
+def iter_definition_blocks(blocks: Iterator[tuple], links: dict) -> Iterator[tuple]:
+    """
+    Passes blocks through, adding the link definitions among them to a dictionary as they are read.
+    :param blocks: iterator of (kind, lines, offsets, start, end) tuples
+    :param links: link definitions, updated in place
+    :return: iterator of the same blocks
+    """
+    for block in blocks:
+        if block[0] == LINE_DEFINITION:
+            add_link_definition(links, *DEFINITION_PATTERN.match(block[1][block[3]]).groups())
+        yield block
+
+def parse_lines(lines: list) -> list:
+    """
+    Parses Markdown lines to a document tree.
+    :param lines: Markdown lines
+    :return: list of the top-level nodes
+    """
+    return list(iter_nodes(lines))
+
+def iter_nodes(lines: list) -> Iterator[Node]:
+    """
+    Parses Markdown lines to a document tree, one top-level node at a time, so a node can be rendered
+    and dropped before the next one is parsed.
+    Every line is classified once, and each block is passed to its parser as a range of the same list.
+    :param lines: Markdown lines
+    :return: iterator of the top-level nodes
+    """
+    return parse_blocks(iter_line_blocks(lines, classify_lines(lines)))
+
+def iter_line_blocks(lines: list, kinds: array) -> Iterator[tuple]:
+    """
+    Splits classified lines into blocks.
+    :param lines: Markdown lines
+    :param kinds: kinds of the lines, see classify_lines()
+    :return: iterator of (kind, lines, offsets, start, end) tuples
+    """
+    offsets = line_offsets(len(lines))
+    return ((kind, lines, offsets, start, end) for kind, start, end in iter_blocks(kinds))
+
+def line_offsets(count: int) -> array:
+    """
+    Creates the offsets of a line buffer. The offset of a line is the number of characters at its start
+    that belong to the enclosing blocks (indentation of a list, blockquote markers), so nested blocks
+    are parsed from the same lines without copying them.
+    :param count: number of lines
+    :return: array of zeros
+    """
+    return array('l', bytes(count * array('l').itemsize))
+
+def parse_range(lines: list, offsets: array, start: int, end: int) -> list:
+    """
+    Parses a range of lines nested in another block, e.g. the indented lines under a list item.
+    :param lines: line buffer
+    :param offsets: offsets of the lines, see line_offsets()
+    :param start: index of the first line
+    :param end: index after the last line
+    :return: list of nodes
+    """
+    return list(parse_blocks(iter_range_blocks(lines, offsets, start, end)))
+
+def iter_range_blocks(lines: list, offsets: array, start: int, end: int) -> Iterator[tuple]:
+    """
+    Classifies a range of lines and splits it into blocks.
+    The lines are read by index from the shared buffer, so a nested range is never copied.
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the first line
+    :param end: index after the last line
+    :return: iterator of (kind, lines, offsets, start, end) tuples
+    """
+    kinds = (classify_line(lines[i], offsets[i]) for i in range(start, end))
+    for kind, block_start, block_end in iter_blocks(kinds, first=start):
+        yield kind, lines, offsets, block_start, block_end
+
+def iter_segments(lines: list, kinds: array) -> Iterator[tuple]:
+    """
+    Splits Markdown lines into top-level segments: runs of blocks after which no tag is left open.
+    A segment is rendered the same way no matter what comes before or after it, so it can be cached on its own.
+    Open tags are tracked by the same rules as in parse_blocks(), without parsing anything.
+    :param lines: Markdown lines
+    :param kinds: kinds of the lines, see classify_lines()
+    :return: iterator of (start, end, blocks), where blocks is a list of (kind, lines, offsets, start, end) tuples
+    """
+    currently_open = []
+    blocks = []
+    offsets = line_offsets(len(lines))
+    for kind, start, end in iter_blocks(kinds):
+        blocks.append((kind, lines, offsets, start, end))
+        if kind == LINE_BLANK:
+            if currently_open:
+                currently_open.pop()
+        elif kind == LINE_HEADER:
+            if currently_open and currently_open[-1] == "p":
+                currently_open.pop()
+            currently_open.append("h")
+        elif kind in BLOCK_CONTINUATIONS:
+            if currently_open and currently_open[-1] == "p":
+                currently_open.pop()
+        elif kind != LINE_RULE and kind != LINE_DEFINITION:
+            if not currently_open or currently_open[-1] != "p":
+                currently_open.append("p")
+        if not currently_open:
+            # The closing fence of a code block is not a part of the block, but it belongs to the segment.
+            if kind == LINE_FENCE and end < len(lines):
+                end += 1
+            yield blocks[0][3], end, blocks
+            blocks = []
+    if blocks:
+        yield blocks[0][3], len(lines), blocks
+
+def iter_stream_blocks(lines: Iterable[str]) -> Iterator[tuple]:
+    """
+    Splits a stream of Markdown lines into blocks, keeping only the current block in memory.
+    Every block is yielded as (kind, buffer, offsets, start, end).
+    The buffer is only valid until the next block is requested.
+    :param lines: any iterable of Markdown lines
+    :return: iterator of (kind, buffer, offsets, start, end) tuples
+    """
+    buffer = []
+    offsets = line_offsets(0)  # offsets of the lines in the buffer, see line_offsets()
+    position = 0  # index of buffer[0] in the whole stream
+
+    def kinds() -> Iterator[int]:
+        for line in lines:
+            buffer.append(line)
+            offsets.append(0)
+            yield classify_line(line)
+
+    for kind, start, end in iter_blocks(kinds(), PART_LINES):
+        yield kind, buffer, offsets, start - position, end - position
+        # The block is parsed, only the line read ahead is kept.
+        del buffer[:end - position]
+        del offsets[:end - position]
+        position = end
+
+def parse_blocks(blocks: Iterable[tuple]) -> Iterator[Node]:
+    """
+    Parses blocks to document tree nodes.
+    Headers and paragraphs stay open until a blank line, and the blocks found meanwhile become their children.
+    :param blocks: iterable of (kind, lines, offsets, start, end) tuples, with the ranges found by iter_blocks()
+    :return: iterator of the top-level nodes, each yielded as soon as it's complete
+    """
+    currently_open = []  # track currently open headers and paragraphs. Last is the latest.
+    blocks = iter(blocks)  # shared with the rows of a split table, see iter_table_parts()
+    for kind, lines, offsets, start, end in blocks:
+        # Link definitions are collected before the blocks are parsed, see link_definitions(), and have no output.
+        if kind == LINE_DEFINITION:
+            continue
+        # Empty line - closing the currently open node.
+        if kind == LINE_BLANK:
+            if currently_open != []:
+                node = currently_open.pop(-1)
+                if currently_open == []:
+                    yield node
+            continue
+        if kind == LINE_RULE:
+            node = Rule()
+        # If nothing else is found, we treat the line as a paragraph.
+        elif kind not in BLOCK_CONTINUATIONS and kind != LINE_HEADER and kind >= 0:
+            text = Text(lines[start][offsets[start]:].rstrip('\n'))
+            if currently_open != [] and type(currently_open[-1]) is Paragraph:
+                currently_open[-1].children.append(text)
+                continue
+            node = Paragraph([text])
+        else:
+            paragraph = close_any_open_paragraph(currently_open)
+            if paragraph is not None:
+                yield paragraph
+            if kind == LINE_PARSED:
+                node = lines
+            elif kind == LINE_HEADER:
+                node = parse_header(lines[start], offsets[start])
+            elif kind == LINE_QUOTE:
+                node = parse_blockquote(lines, offsets, start, end)
+            elif kind == LINE_TABLE:
+                node = parse_table(lines, offsets, start, end)
+            elif kind == LINE_TABLE_PART:
+                # The rest of the table is read as the rows are iterated, so it must be read before the next block.
+                node = parse_table(lines, offsets, start, end)
+                node.rows = iter_table_parts(node.rows, blocks)
+                if currently_open != []:
+                    node.rows = list(node.rows)
+            elif kind == LINE_TASK:
+                node = parse_task_list(lines, offsets, start, end)
+            elif kind == LINE_ORDERED_START:
+                node = parse_ordered_list(lines, offsets, start, end)
+            elif kind == LINE_UNORDERED:
+                node = parse_unordered_list(lines, offsets, start, end)
+            elif kind == LINE_FENCE_PART:
+                # As with tables, the rest of the code block is read as its lines are iterated.
+                node = parse_code_block(lines, offsets, start, end)
+                node.lines = iter_code_parts(node.lines, blocks)
+                if currently_open != []:
+                    node.lines = list(node.lines)
+            else:
+                node = parse_code_block(lines, offsets, start, end)
+
+        if currently_open != []:
+            currently_open[-1].children.append(node)
+        if type(node) is Paragraph or type(node) is Heading:
+            currently_open.append(node)
+        elif currently_open == []:
+            yield node
+            if kind == LINE_TABLE_PART:
+                for _ in node.rows:  # the rows that were not rendered
+                    pass
+            elif kind == LINE_FENCE_PART:
+                for _ in node.lines:
+                    pass
+
+    if currently_open != []:
+        yield currently_open[0]
+
+def classify_line(line: str, position: int = 0) -> int:
+    """
+    Classifies a Markdown line by the block it starts or continues.
+    The checks follow the same priority as the block detection in parse_blocks().
+    :param line: line from the Markdown file
+    :param position: offset of the line, the characters before it belong to the enclosing blocks
+    :return: one of the LINE_* kinds
+    """
+    first = line[position:position + 1]
+    if first == "\n":
+        return LINE_BLANK
+    if first == "#":
+        return LINE_HEADER
+    if first == ">":
+        return LINE_QUOTE
+    if first == "|":
+        if line.startswith("| ", position):
+            return LINE_TABLE
+        if line.startswith("|:", position) or line.startswith("|-", position):
+            return LINE_TABLE_RULE
+        return LINE_TEXT
+    if first in "-*+_":
+        if first == "-" and TASK_PATTERN.match(line, position):
+            return LINE_TASK
+        if line[position + 1:position + 2] == " " and first != "_":
+            return LINE_UNORDERED
+        if RULE_PATTERN.match(line, position):
+            return LINE_RULE
+        return LINE_TEXT
+    if first == "`" and line.startswith("```", position):
+        return LINE_FENCE
+    if first == "[" and position == 0 and DEFINITION_PATTERN.match(line):
+        return LINE_DEFINITION
+    if first == " ":
+        return LINE_INDENTED
+    if ORDERED_ITEM_PATTERN.match(line, position):
+        return LINE_ORDERED_START if line.startswith("1. ", position) else LINE_ORDERED
+    return LINE_TEXT
+
+def classify_lines(lines: list) -> array:
+    """
+    Classifies all lines at once.
+    :param lines: Markdown lines
+    :return: compact array with the LINE_* kind of every line
+    """
+    return array('b', map(classify_line, lines))
+
+def iter_blocks(kinds, part_lines: int = 0, first: int = 0) -> Iterator[tuple]:
+    """
+    Finds where every block starts and ends, using only the kinds of the lines.
+    Lines of a list, table or blockquote continue the block as long as their kind is in BLOCK_CONTINUATIONS.
+    A fenced code block ends before the closing fence, which is skipped.
+    With part_lines, a longer table or code block is split into parts, so it never has to be read as a whole.
+    Every part but the last one has the kind LINE_TABLE_PART or LINE_FENCE_PART.
+    :param kinds: iterable with the LINE_* kind of every line
+    :param part_lines: maximum number of lines of a part, 0 to keep all blocks whole
+    :param first: index of the first line, e.g. the start of a nested range
+    :return: iterator of (kind, start, end) tuples, where end is exclusive
+    """
+    block_kind = None
+    start = first
+    index = first - 1
+    for index, kind in enumerate(kinds, first):
+        if block_kind is not None:
+            if block_kind == LINE_FENCE:
+                if kind == LINE_FENCE:
+                    yield block_kind, start, index
+                    block_kind = None
+                elif index - start == part_lines:
+                    yield LINE_FENCE_PART, start, index
+                    start = index
+                continue
+            if kind in BLOCK_CONTINUATIONS[block_kind]:
+                if index - start == part_lines and block_kind == LINE_TABLE:
+                    yield LINE_TABLE_PART, start, index
+                    start = index
+                continue
+            yield block_kind, start, index
+            block_kind = None
+        if kind in BLOCK_CONTINUATIONS:
+            block_kind = kind
+            start = index
+        else:
+            yield kind, index, index + 1
+    if block_kind is not None:
+        yield block_kind, start, index + 1
+
+def close_any_open_paragraph(currently_open: list) -> Paragraph:
+    """
+    Closes the paragraph if it's the currently open node.
+    :param currently_open: list of currently open nodes, updated in place
+    :return: the paragraph if it was a top-level node, so it's complete, otherwise None
+    """
+    if currently_open != [] and type(currently_open[-1]) is Paragraph:
+        paragraph = currently_open.pop(-1)
+        if currently_open == []:
+            return paragraph
+    return None
+
+def format_inline(text: str) -> str:
+    """
+    Converts inline Markdown (formatting, links, images and escapes) to HTML.
+    :param text: text of a paragraph line, header, list item or table cell
+    :return: Text formatted as HTML
+    """
+    tokenized_line = tokenize_line(text)
+    tokenized_line[0] = check_for_formatting(tokenized_line[0])
+    return detokenize_line(tokenized_line[0], tokenized_line[1])
+
+def render_text(text: str, links: dict) -> str:
+    """
+    Converts inline Markdown to HTML, resolving the reference-style links with the definitions of its document.
+    The references are resolved before the memo, so it's keyed by the resolved text and shared by all documents.
+    :param text: text of a paragraph line, header, list item or table cell
+    :param links: link definitions of the document, see link_definitions(). None or empty when there are none.
+    :return: Text formatted as HTML
+    """
+    if links and "[" in text:
+        text = resolve_references(text, links)
+    return render_inline(text)
+
+def resolve_references(text: str, links: dict) -> str:
+    """
+    Rewrites the reference-style links and images with a defined label to inline ones: [text][label], [label][]
+    and [label] to [text](url), which are then tokenized as any other link. Every reference is one dictionary lookup.
+    References to undefined labels, and the ones in code spans, are kept as they are.
+    :param text: inline Markdown
+    :param links: link definitions, see link_definitions()
+    :return: inline Markdown with the references replaced
+    """
+    def replace_reference(match: re.Match) -> str:
+        link_text = match.group(3)
+        if link_text is None:
+            return match.group(0)
+        url = links.get(normalize_label(match.group(4) or link_text))
+        if url is None:
+            return match.group(0)
+        return f'{match.group(2)}[{link_text}]({url})'
+
+    return REFERENCE_PATTERN.sub(replace_reference, text)
+
+def normalize_label(label: str) -> str:
+    """
+    Normalizes a link label, so labels are matched case-insensitively and regardless of their whitespace.
+    :param label: label of a link definition or reference
+    :return: case-folded label with single spaces
+    """
+    return " ".join(label.split()).casefold()
+
+def add_link_definition(links: dict, label: str, url: str) -> None:
+    """
+    Adds a link definition, unless its label is already defined: the first definition of a label is used.
+    :param links: link definitions, updated in place
+    :param label: label of the definition
+    :param url: URL of the definition, optionally in angle brackets
+    :return: None
+    """
+    if url.startswith("<"):
+        url = url[1:-1]
+    # Parentheses would end the inline link the reference is rewritten to, see resolve_references().
+    links.setdefault(normalize_label(label), url.replace("(", "%28").replace(")", "%29"))
+
+def link_definitions(lines: list) -> dict:
+    """
+    Collects the link definitions ('[label]: url' lines at the top level) of a document, for render_html().
+    :param lines: Markdown lines
+    :return: dictionary: normalized label -> URL
+    """
+    return collect_link_definitions(lines, classify_lines(lines))
+
+def collect_link_definitions(lines: list, kinds: array) -> dict:
+    """
+    Collects the link definitions of classified lines.
+    Only the kinds are scanned, and the blocks are walked only when a definition was found, skipping code blocks.
+    :param lines: Markdown lines
+    :param kinds: kinds of the lines, see classify_lines()
+    :return: dictionary: normalized label -> URL
+    """
+    links = {}
+    if LINE_DEFINITION in kinds:
+        for kind, start, _ in iter_blocks(kinds):
+            if kind == LINE_DEFINITION:
+                add_link_definition(links, *DEFINITION_PATTERN.match(lines[start]).groups())
+    return links
+
+def reserve_header_ids(toc: TableOfContents, lines: list, kinds: array) -> None:
+    """
+    Reserves the explicit ids of the top-level headers of classified lines, see TableOfContents.
+    :param toc: table of contents the lines are rendered to
+    :param lines: Markdown lines
+    :param kinds: kinds of the lines, see classify_lines()
+    :return: None
+    """
+    if LINE_HEADER in kinds:
+        for kind, start, _ in iter_blocks(kinds):
+            if kind == LINE_HEADER and "{#" in lines[start]:
+                match = HEADER_ID_PATTERN.search(lines[start].rstrip('\n'))
+                if match is not None:
+                    toc.reserve(match.group(1))
+
+def scan_lookahead(lines: Iterable[str], toc: TableOfContents) -> dict:
+    """
+    Collects the link definitions and reserves the explicit header ids of a document in one scan, so a file
+    streamed by iter_html() afterwards is converted the same way as by handle_conversion().
+    Only fences, headers and definitions are told apart: a header or a definition is a top-level block of its own,
+    unless it's inside a code block, so no other line has to be classified.
+    :param lines: Markdown lines, or only the ones starting with one of LOOKAHEAD_PREFIXES
+    :param toc: table of contents the lines are rendered to
+    :return: dictionary: normalized label -> URL
+    """
+    links = {}
+    fenced = False
+    for line in lines:
+        if not line.startswith(LOOKAHEAD_PREFIXES):
+            continue
+        if line.startswith("```"):
+            fenced = not fenced
+        elif fenced:
+            continue
+        elif line.startswith("#"):
+            if "{#" in line:
+                match = HEADER_ID_PATTERN.search(line.rstrip('\n'))
+                if match is not None:
+                    toc.reserve(match.group(1))
+        else:
+            match = DEFINITION_PATTERN.match(line)
+            if match is not None:
+                add_link_definition(links, *match.groups())
+    return links
+
+def set_inline_cache_size(size: int) -> None:
+    """
+    Sets the size of the memo in front of format_inline(). Repeated texts (table cells, list items...)
+    are then rendered only once. Clears the memo and its statistics.
+    :param size: maximum number of memoized texts, 0 disables the memo
+    :return: None
+    """
+    global render_inline
+    if size > 0:
+        render_inline = functools.lru_cache(maxsize=size)(format_inline)
+    else:
+        render_inline = format_inline
+
+def inline_cache_stats() -> dict:
+    """
+    Returns the statistics of the memo in front of format_inline().
+    :return: dictionary with hits, misses, size, max_size and hit_rate
+    """
+    if render_inline is format_inline:
+        return {'hits': 0, 'misses': 0, 'size': 0, 'max_size': 0, 'hit_rate': 0.0}
+    info = render_inline.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_rate': info.hits / lookups if lookups else 0.0,
+    }
+
+# Inline rendering used by all handlers, memoized by set_inline_cache_size()
+render_inline = functools.lru_cache(maxsize=INLINE_CACHE_SIZE)(format_inline)
+
+def tokenize_line(line: str) -> list:
+    """
+    Tokenizes a line by replacing images, links and escape characters with tokens.
+    Each kind of construct is matched by one compiled pattern in a single left-to-right pass.
+    Escapes are replaced first, then images, links, and finally e-mail addresses and URLs,
+    so an image inside a link text is bound to the image before the link is matched.
+    Tokens are written as TOKEN_START + index + TOKEN_END. The markers are private-use characters,
+    and any marker already present in the source is itself stored as a token, so tokens cannot collide with the text.
+    :param line:
+    :return: [tokenized string, [key0, key1, ...]]
+    """
+    tokens = []
+
+    def replace_literal(match: re.Match) -> str:
+        tokens.append(match.group(0))
+        return f'{TOKEN_START}{len(tokens) - 1}{TOKEN_END}'
+
+    def replace_escape(match: re.Match) -> str:
+        tokens.append(match.group(1))
+        return f'{TOKEN_START}{len(tokens) - 1}{TOKEN_END}'
+
+    def replace_image(match: re.Match) -> str:
+        tokens.append(f'<img src="{match.group(2)}" alt="{match.group(1)}">')
+        return f'{TOKEN_START}{len(tokens) - 1}{TOKEN_END}'
+
+    def replace_link(match: re.Match) -> str:
+        tokens.append(f'<a href="{match.group(2)}">{match.group(1)}</a>')
+        return f'{TOKEN_START}{len(tokens) - 1}{TOKEN_END}'
+
+    def replace_autolink(match: re.Match) -> str:
+        email = match.group(1)
+        if email is not None:
+            tokens.append(f'<a href="mailto:{email}">{email}</a>')
+        else:
+            url = match.group(2)
+            tokens.append(f'<a href="{url}">{url}</a>')
+        return f'{TOKEN_START}{len(tokens) - 1}{TOKEN_END}'
+
+    # Cheap membership tests let plain text skip the passes that cannot match at all.
+    if TOKEN_START in line or TOKEN_END in line:
+        line = TOKEN_MARKER_PATTERN.sub(replace_literal, line)
+    if "\\" in line:
+        line = ESCAPE_PATTERN.sub(replace_escape, line)
+    if "](" in line:
+        if "![" in line:
+            line = IMAGE_PATTERN.sub(replace_image, line)
+        line = LINK_PATTERN.sub(replace_link, line)
+    if "<" in line:
+        line = AUTOLINK_PATTERN.sub(replace_autolink, line)
+
+    output = [line, tokens]
+    return output
+
+def detokenize_line(line: str, tokens: list) -> str:
+    """
+    Replaces tokens in the line with the corresponding image or link tags.
+    All tokens are restored in a single pass. Tokens nested in a link or image text are restored along with it.
+    :param line: line with tokens
+    :param tokens: list of tokens to replace
+    :return: line with tokens replaced by image or link tags
+    """
+    if TOKEN_START not in line:
+        return line
+
+    def restore(match: re.Match) -> str:
+        token = tokens[int(match.group(1))]
+        if TOKEN_START in token:
+            token = TOKEN_PATTERN.sub(restore, token)
+        return token
+
+    return TOKEN_PATTERN.sub(restore, line)
+
+def check_for_formatting(line: str) -> str:
+    """
+    Checks for Markdown formatting in the line and returns the formatted line.
+    Delimiter runs are scanned once, left to right. A run that may close is matched with the nearest opener
+    of the same character on a stack, so every run is visited once and the line is never copied in between.
+    Runs that are left without a partner stay in the text as they are.
+    :param line: line from the Markdown file
+    :return: Text formatted as HTML
+    """
+    parts = []  # literal strings and delimiter runs: [character, count left, closing tags, opening tags]
+    openers = []  # indices (in parts) of the delimiter runs that can still be closed. Last is the latest.
+    open_counts = dict.fromkeys(FORMATTING_TAGS, 0)  # number of openers on the stack for every character
+    unclosed_code = set()  # lengths of backtick runs that have no closing run further in the line
+    position = 0
+    while True:
+        match = DELIMITER_PATTERN.search(line, position)
+        if match is None:
+            parts.append(line[position:])
+            break
+        start, end = match.span()
+        if start > position:
+            parts.append(line[position:start])
+        position = end
+        run = match.group(0)
+        character = run[0]
+        count = end - start
+
+        # Code spans are closed by a run of the same length, and their content is not formatted.
+        if character == "`":
+            closing = None
+            if count not in unclosed_code:
+                closing = code_span_pattern(count).search(line, end)
+            if closing is None:
+                unclosed_code.add(count)
+                parts.append(run)
+            else:
+                parts.append(f"<code>{line[end:closing.start()]}</code>")
+                position = closing.end()
+            continue
+
+        tags = FORMATTING_TAGS[character]
+        shortest = min(tags)
+        if count < shortest:
+            parts.append(run)
+            continue
+        # Only a run with whitespace on both sides (e.g. 'a * b') is text. The ends of the line aren't whitespace.
+        if line[start - 1:start].isspace() and line[end:end + 1].isspace():
+            parts.append(run)
+            continue
+
+        delimiter = [character, count, [], []]
+        if open_counts[character] > 0:
+            while delimiter[1] > 0 and open_counts[character] > 0:
+                # Openers of other characters between the pair can no longer be closed.
+                while parts[openers[-1]][0] != character:
+                    open_counts[parts[openers.pop()][0]] -= 1
+                opener = parts[openers[-1]]
+                use = max(size for size in tags if size <= min(opener[1], delimiter[1]))
+                opener[1] -= use
+                delimiter[1] -= use
+                opener[3].append(tags[use][0])
+                delimiter[2].append(tags[use][1])
+                if opener[1] < shortest:
+                    openers.pop()
+                    open_counts[character] -= 1
+                if delimiter[1] < shortest:
+                    break
+        parts.append(delimiter)
+        if delimiter[1] >= shortest:
+            openers.append(len(parts) - 1)
+            open_counts[character] += 1
+
+    output = []
+    for part in parts:
+        if type(part) is str:
+            output.append(part)
+        else:
+            # The first match is the innermost one, so opening tags are written in reverse.
+            output.append("".join(part[2]) + part[0] * part[1] + "".join(reversed(part[3])))
+    line = "".join(output)
+    if line.endswith("  "):
+        line = line.rstrip("  ")
+        line += "<br>"
+    return line
+
+def code_span_pattern(length: int) -> re.Pattern:
+    """
+    Returns a compiled pattern matching a backtick run of exactly the given length.
+    :param length: number of backticks
+    :return: compiled pattern
+    """
+    pattern = CODE_SPAN_PATTERNS.get(length)
+    if pattern is None:
+        pattern = re.compile(r'(?<!`)' + '`' * length + r'(?!`)')
+        CODE_SPAN_PATTERNS[length] = pattern
+    return pattern
+
+def parse_header(line: str, position: int = 0) -> Heading:
+    """
+    Parses a header line
+    :param line: header line
+    :param position: offset of the line
+    :return: Heading without children
+    """
+    anchor = None
+    line = line[position:]
+    level = len(line) - len(line.lstrip('#'))
+    if level <= 6 and line[level:level + 1] == ' ':
+        line = line.lstrip('# ')
+    else:
+        # Arguments are only formatted when warnings are logged.
+        log.warn("Unexpected header format! Too many #: %s", line)
+        log.warn("Treating the line as H6 header.")
+        level = 6
+        line = line.lstrip('######')
+    line = line.rstrip('\n')
+    if "{#" in line:
+        match = HEADER_ID_PATTERN.search(line)
+        if match is not None:
+            anchor = match.group(1)
+            line = line[:match.start()]
+    return Heading(level, Text(line), [], anchor)
+
+def parse_blockquote(lines: list, offsets: array, start: int, end: int) -> Blockquote:
+    """
+    Parses blockquotes, including the nested ones, in a single pass over the lines.
+    The depth of every line ('>' with an optional space, repeated) is read once, and the offset of the line is moved
+    past its markers. Open blockquotes are kept on a stack, each collecting its runs of lines and its nested
+    blockquotes, and every run is parsed once by the blockquote it belongs to.
+    Inside a fenced code block, the markers beyond the depth of the block are a part of the code.
+    :param lines: line buffer
+    :param offsets: offsets of the lines, updated in place
+    :param start: index of the first line of the blockquote
+    :param end: index after the last line of the blockquote
+    :return: Blockquote
+    """
+    stack = [[]]  # items of the open blockquotes: [start, end] runs of lines and nested Blockquotes
+    fence_depth = 0  # depth of the blockquote with an open code block, 0 when there is none
+    for i in range(start, end):
+        line = lines[i]
+        position = offsets[i]
+        markers = QUOTE_MARKERS_PATTERN.match(line, position)
+        depth = markers.group().count('>')
+        if fence_depth and depth >= fence_depth:
+            depth = fence_depth
+            for _ in range(depth):
+                position = QUOTE_MARKER_PATTERN.match(line, position).end()
+        else:
+            position = markers.end()
+        offsets[i] = position
+
+        while len(stack) > depth:
+            items = stack.pop()
+            stack[-1].append(Blockquote(list(parse_blocks(iter_quote_blocks(lines, offsets, items)))))
+            fence_depth = 0
+        while len(stack) < depth:
+            stack.append([])
+        items = stack[-1]
+        if items and type(items[-1]) is list:
+            items[-1][1] = i + 1
+        else:
+            items.append([i, i + 1])
+        if line.startswith("```", position):
+            fence_depth = 0 if fence_depth else depth
+
+    while len(stack) > 1:
+        items = stack.pop()
+        stack[-1].append(Blockquote(list(parse_blocks(iter_quote_blocks(lines, offsets, items)))))
+    return Blockquote(list(parse_blocks(iter_quote_blocks(lines, offsets, stack[0]))))
+
+def iter_quote_blocks(lines: list, offsets: array, items: list) -> Iterator[tuple]:
+    """
+    Turns the items collected for a blockquote into blocks. Nested blockquotes are already parsed.
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param items: [start, end] runs of lines and Blockquotes
+    :return: iterator of (kind, lines, offsets, start, end) tuples, LINE_PARSED for the Blockquotes
+    """
+    for item in items:
+        if type(item) is Blockquote:
+            yield LINE_PARSED, item, None, 0, 0
+        else:
+            yield from iter_range_blocks(lines, offsets, item[0], item[1])
+
+def parse_nested_lines(lines: list, offsets: array, i: int, end: int, indent_depth: int) -> tuple:
+    """
+    Parses the indented lines under a list item, starting at lines[i].
+    Up to indent_depth leading spaces of every line are skipped by moving its offset.
+    :param lines: line buffer
+    :param offsets: offsets of the lines, updated in place
+    :param i: index of the first indented line
+    :param end: index after the last line of the list
+    :param indent_depth: number of spaces skipped in every line
+    :return: (Nested, number of lines used)
+    """
+    indent = ' ' * indent_depth
+    nested_end = i
+    while True:
+        line = lines[nested_end]
+        position = offsets[nested_end]
+        if line.startswith(indent, position):
+            offsets[nested_end] = position + indent_depth
+        else:
+            # Less indented than the first line, only the leading spaces are skipped.
+            offsets[nested_end] = LEADING_SPACES_PATTERN.match(line, position).end()
+        nested_end += 1
+        if nested_end == end or not lines[nested_end].startswith(" ", offsets[nested_end]):
+            break
+    return Nested(parse_range(lines, offsets, i, nested_end)), nested_end - i
+
+def parse_ordered_list(lines: list, offsets: array, start: int, end: int) -> List:
+    """
+    Parses ordered lists
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the first line of the list
+    :param end: index after the last line of the list
+    :return: List
+    """
+    items = []
+    i = start
+    while i < end:
+        line = lines[i]
+        position = offsets[i]
+        match = ORDERED_ITEM_PATTERN.match(line, position)
+        if match:
+            items.append(Text(line[match.end():].rstrip("\n")))
+        elif line.startswith(' ', position):
+            indent_depth = LEADING_SPACES_PATTERN.match(line, position).end() - position
+            nested, deeper_lines_count = parse_nested_lines(lines, offsets, i, end, indent_depth)
+            items.append(nested)
+            i += deeper_lines_count
+            continue
+        i += 1
+    return List(True, items)
+
+def parse_unordered_list(lines: list, offsets: array, start: int, end: int) -> List:
+    """
+    Parses unordered lists
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the first line of the list
+    :param end: index after the last line of the list
+    :return: List
+    """
+    items = []
+    i = start
+    while i < end:
+        line = lines[i]
+        position = offsets[i]
+        match = UNORDERED_ITEM_PATTERN.match(line, position)
+        if match:
+            items.append(Text(line[match.end():].rstrip("\n")))
+        elif line.startswith(' ', position):
+            indent_depth = LEADING_WHITESPACE_PATTERN.match(line, position).end() - position
+            nested, deeper_lines_count = parse_nested_lines(lines, offsets, i, end, indent_depth)
+            items.append(nested)
+            i += deeper_lines_count
+            continue
+        i += 1
+    return List(False, items)
+
+def parse_code_block(lines: list, offsets: array, start: int, end: int) -> CodeBlock:
+    """
+    Parses code blocks
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the opening fence
+    :param end: index of the closing fence, or after the last line when the block is not closed
+    :return: CodeBlock
+    """
+    info = lines[start][offsets[start] + 3:].strip()
+    return CodeBlock(info, parse_code_lines(lines, offsets, start + 1, end))
+
+def parse_code_lines(lines: list, offsets: array, start: int, end: int) -> list:
+    """
+    Parses the lines of a code block. The code is kept as it is, only the trailing whitespace is removed.
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the first line of code
+    :param end: index after the last line of code
+    :return: list of lines, without line breaks
+    """
+    return [lines[i][offsets[i]:].rstrip() for i in range(start, end)]
+
+def iter_code_parts(code: list, blocks: Iterator[tuple]) -> Iterator[str]:
+    """
+    Iterates over the lines of a code block split by iter_blocks(), parsing every following part when it's reached.
+    :param code: lines of the first part
+    :param blocks: iterator of blocks, the next one is the following part of the code block
+    :return: iterator of lines
+    """
+    yield from code
+    kind = LINE_FENCE_PART
+    while kind == LINE_FENCE_PART:
+        kind, lines, offsets, start, end = next(blocks)
+        yield from parse_code_lines(lines, offsets, start, end)
+
+def parse_table(lines: list, offsets: array, start: int, end: int) -> Table:
+    """
+    Parses tables
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the first line of the table
+    :param end: index after the last line of the table
+    :return: Table
+    """
+    column_alignments = []
+    first_header = False
+    if end - start >= 2 and TABLE_RULE_PATTERN.match(lines[start + 1], offsets[start + 1]):
+        first_header = True
+        matches = TABLE_ALIGNMENT_PATTERN.finditer(lines[start + 1], offsets[start + 1])
+        for match in matches:
+            alignment = match.group(0)
+            if alignment.startswith(':') and alignment.endswith(':'):
+                column_alignments.append('center')
+            elif alignment.startswith(':'):
+                column_alignments.append('left')
+            elif alignment.endswith(':'):
+                column_alignments.append('right')
+            else:
+                column_alignments.append('center') # Default behaviour in many web browsers
+        rows = parse_table_rows(lines, offsets, start, start + 1)
+        rows += parse_table_rows(lines, offsets, start + 2, end)
+    else:
+        rows = parse_table_rows(lines, offsets, start, end)
+    return Table(first_header, column_alignments, rows)
+
+def parse_table_rows(lines: list, offsets: array, start: int, end: int) -> list:
+    """
+    Parses table rows. Cells are separated by pipes, and an empty cell ('||') is skipped.
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the first row
+    :param end: index after the last row
+    :return: list of rows, each a list of Text cells
+    """
+    rows = []
+    for i in range(start, end):
+        line = lines[i]
+        if "\\" in line:
+            cells = TABLE_CELL_PATTERN.findall(line, offsets[i])
+        else:
+            # Without escaped pipes, every pipe separates cells.
+            cells = line[offsets[i]:].rstrip("\n").split("|")
+        rows.append([Text(cell.strip()) for cell in cells if cell])
+    return rows
+
+def iter_table_parts(rows: list, blocks: Iterator[tuple]) -> Iterator[list]:
+    """
+    Iterates over the rows of a table split by iter_blocks(), parsing every following part when it's reached.
+    :param rows: rows of the first part
+    :param blocks: iterator of blocks, the next one is the following part of the table
+    :return: iterator of rows
+    """
+    yield from rows
+    kind = LINE_TABLE_PART
+    while kind == LINE_TABLE_PART:
+        kind, lines, offsets, start, end = next(blocks)
+        yield from parse_table_rows(lines, offsets, start, end)
+
+def parse_task_list(lines: list, offsets: array, start: int, end: int) -> TaskList:
+    """
+    Parses task lists
+    :param lines: line buffer
+    :param offsets: offsets of the lines
+    :param start: index of the first line of the task list
+    :param end: index after the last line of the task list
+    :return: TaskList
+    """
+    items = []
+    i = start
+    while i < end:
+        line = lines[i]
+        position = offsets[i]
+        match = TASK_PATTERN.match(line, position)
+        if match:
+            items.append(Task(match.group(1) == 'x', Text(match.group(2).strip())))
+        elif line.startswith(' ', position):
+            indent_depth = LEADING_WHITESPACE_PATTERN.match(line, position).end() - position
+            nested, deeper_lines_count = parse_nested_lines(lines, offsets, i, end, indent_depth)
+            items.append(nested)
+            i += deeper_lines_count
+            continue
+        i += 1
+    return TaskList(items)
+
+def render_html(nodes: list, output: list, tags: tuple = None, links: dict = None,
+                toc: TableOfContents = None) -> None:
+    """
+    Renders document tree nodes to HTML, appending the HTML parts to the output list.
+    Nested nodes write to the same list, so they are never concatenated into intermediate strings.
+    :param nodes: iterable of nodes, e.g. returned by parse_lines() or iter_nodes()
+    :param output: list of HTML parts to append to
+    :param tags: tag table, see compile_tags(). None for the tags of the configuration file.
+    :param links: link definitions of the document, see link_definitions(). None if it has none.
+    :param toc: table of contents the headers are added to, None for a new one, see convert()
+    :return: None
+    """
+    if tags is None:
+        tags = load_tags()
+    if toc is None:
+        toc = TableOfContents()
+    for node in nodes:
+        render_node(node, output, tags, links, toc)
+
+def render_node(node: Node, output: list, tags: tuple, links: dict = None, toc: TableOfContents = None) -> None:
+    """
+    Renders a single node to HTML.
+    :param node: document tree node
+    :param output: list of HTML parts to append to
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the document, see link_definitions()
+    :param toc: table of contents the headers are added to
+    :return: None
+    """
+    node_type = type(node)
+    if node_type is Paragraph:
+        render_paragraph(node, output, tags, links)
+    elif node_type is Heading:
+        render_heading(node, output, tags, links, toc)
+    elif node_type is Rule:
+        output.append(tags[TAG_HR][0])
+    elif node_type is List:
+        render_list(node, output, tags, links, toc)
+    elif node_type is Table:
+        render_table(node, output, tags, links)
+    elif node_type is TaskList:
+        render_task_list(node, output, tags, links, toc)
+    elif node_type is CodeBlock:
+        render_code_block(node, output, tags)
+    elif node_type is Blockquote:
+        opening, closing = tags[TAG_BLOCKQUOTE]
+        output.append(opening)
+        render_html(node.children, output, tags, links, toc)
+        output.append(closing)
+    else:
+        render_html(node.children, output, tags, links, toc)
+
+def render_paragraph(node: Paragraph, output: list, tags: tuple, links: dict = None) -> None:
+    """
+    Renders a paragraph, joining its lines with spaces.
+    :param node: Paragraph
+    :param output: list of HTML parts to append to
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the document
+    :return: None
+    """
+    opening, closing = tags[TAG_P]
+    output.append(opening)
+    first = True
+    for child in node.children:
+        if type(child) is Rule:
+            output.append(tags[TAG_HR][0])
+            continue
+        if not first and not output[-1].endswith("<br>"):
+            output.append(" ")
+        first = False
+        output.append(render_text(child.source, links))
+    output.append(closing)
+
+def render_heading(node: Heading, output: list, tags: tuple, links: dict = None, toc: TableOfContents = None) -> None:
+    """
+    Renders a header with its id, and the blocks opened under it.
+    :param node: Heading
+    :param output: list of HTML parts to append to
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the document
+    :param toc: table of contents the header is added to
+    :return: None
+    """
+    opening, closing = tags[node.level]
+    html = render_text(node.text.source, links)
+    if toc is None:
+        toc = TableOfContents()
+    # The id is added to the opening tag from the tag table, as the alignment of table cells is.
+    anchor = toc.add(node.level, INLINE_TAG_PATTERN.sub('', html), node.anchor)
+    output.append(f'{opening[:-1]} id="{anchor}">')
+    output.append(html)
+    render_html(node.children, output, tags, links, toc)
+    output.append(closing)
+
+def render_list(node: List, output: list, tags: tuple, links: dict = None, toc: TableOfContents = None) -> None:
+    """
+    Renders ordered and unordered lists
+    :param node: List
+    :param output: list of HTML parts the formatted list is appended to
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the document, see link_definitions()
+    :param toc: table of contents the headers are added to
+    :return: None
+    """
+    opening, closing = tags[TAG_OL] if node.ordered else tags[TAG_UL]
+    item_opening, item_closing = tags[TAG_LI]
+    output.append(opening)
+    for item in node.items:
+        if type(item) is Text:
+            output.append(item_opening)
+            output.append(render_text(item.source, links))
+            output.append(item_closing)
+        else:
+            render_html(item.children, output, tags, links, toc)
+    output.append(closing)
+
+def render_code_block(node: CodeBlock, output: list, tags: tuple) -> None:
+    """
+    Renders code blocks
+    :param node: CodeBlock
+    :param output: list of HTML parts the formatted code block is appended to
+    :param tags: tag table, see compile_tags()
+    :return: None
+    """
+    output.extend(iter_code_html(node, tags))
+
+def iter_code_html(node: CodeBlock, tags: tuple) -> Iterator[str]:
+    """
+    Renders a code block, escaped, PART_LINES lines at a time.
+    The first word of the info string is the language, set as the class of the code, e.g. language-python.
+    :param node: CodeBlock
+    :param tags: tag table, see compile_tags()
+    :return: iterator of HTML parts: the opening tags, the code and the closing tags
+    """
+    language = node.info.split(maxsplit=1)[0] if node.info else ""
+    if language:
+        opening, rest = tags[TAG_CODE_LANGUAGE]
+        yield opening + escape_html(language, quote=True) + rest
+    else:
+        yield tags[TAG_CODE][0]
+    lines = iter(node.lines)
+    while True:
+        part = list(itertools.islice(lines, PART_LINES))
+        if not part:
+            break
+        part.append("")  # the line break after the last line
+        yield escape_html("\n".join(part))
+    yield tags[TAG_CODE][1]
+
+def escape_html(text: str, quote: bool = False) -> str:
+    """
+    Escapes the characters with a meaning in HTML.
+    Chained replace() calls are used, as they are many times faster than str.translate() with multi-character replacements.
+    :param text: text to escape
+    :param quote: also escape double quotes, for attribute values
+    :return: escaped text
+    """
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if quote:
+        text = text.replace('"', "&quot;")
+    return text
+
+def compile_tags(classes: dict) -> tuple:
+    """
+    Compiles the CSS classes of a configuration to a tag table: a tuple with the finished opening and closing tags
+    of every element, at the TAG_* indices. Renderers only pick the tags from it, nothing is formatted per element.
+    :param classes: dictionary: element -> CSS classes, checked by config_classes()
+    :return: tag table
+    """
+    def opening(element: str, attributes: str = "") -> str:
+        css = classes.get(element, "").strip()
+        if css:
+            attributes = f' class="{escape_html(css, quote=True)}"' + attributes
+        return f"<{element}{attributes}>"
+
+    code_class = classes.get('code', "").strip()
+    tags = [
+        (opening('p'), "</p>\n"),
+        *((opening(f'h{level}'), f"</h{level}>\n") for level in range(1, 7)),
+        (opening('hr') + "\n", ""),
+        (opening('blockquote') + "\n", "</blockquote>\n"),
+        (opening('ul') + "\n", "</ul>\n"),
+        (opening('ol') + "\n", "</ol>\n"),
+        (opening('li'), "</li>\n"),
+        (opening('table') + "\n", "</table>\n"),
+        (opening('tr') + "\n", "</tr>\n"),
+        (opening('th'), "</th>\n"),
+        (opening('td'), "</td>\n"),
+        (opening('pre') + opening('code') + "\n", "</code></pre>\n"),
+        (opening('pre') + '<code class="language-',
+         (f' {escape_html(code_class, quote=True)}' if code_class else "") + '">\n'),
+        (opening('input', ' type="checkbox" checked disabled') + " ", "<br>\n"),
+        (opening('input', ' type="checkbox" disabled') + " ", "<br>\n"),
+        (opening('div', " style='margin-left: 20px;'") + "\n", "</div>\n"),
+    ]
+    return tuple(tags)
+
+# Tag table used when there is no configuration file
+DEFAULT_TAGS = compile_tags({})
+
+def render_table(node: Table, output: list, tags: tuple, links: dict = None) -> None:
+    """
+    Renders tables
+    :param node: Table
+    :param output: list of HTML parts the formatted table is appended to
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the document, see link_definitions()
+    :return: None
+    """
+    output.extend(iter_table_html(node, tags, links))
+
+def iter_table_html(node: Table, tags: tuple, links: dict = None) -> Iterator[str]:
+    """
+    Renders a table one row at a time.
+    The opening tags of the columns are made once per table, and cells without markup are not rendered as inline text.
+    :param node: Table
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the document, see link_definitions()
+    :return: iterator of HTML parts: the opening tag, every row and the closing tag
+    """
+    opening, closing = tags[TAG_TABLE]
+    row_tags = tags[TAG_TR]
+    yield opening
+    rows = iter(node.rows)
+    if node.header:
+        header_opening, header_closing = tags[TAG_TH]
+        for row in rows:
+            yield render_table_row(row, column_tags(header_opening, node.alignments, len(row)), header_closing, row_tags,
+                                   links)
+            break
+    cell_opening, cell_closing = tags[TAG_TD]
+    cell_tags = []
+    for row in rows:
+        if len(row) > len(cell_tags):
+            cell_tags = column_tags(cell_opening, node.alignments, len(row))
+        yield render_table_row(row, cell_tags, cell_closing, row_tags, links)
+    yield closing
+
+def column_tags(opening: str, alignments: list, count: int) -> list:
+    """
+    Makes the opening tags of table cells. Columns without an alignment are centered.
+    :param opening: opening tag of the cells from the tag table, the alignment is added to it
+    :param alignments: alignments of the columns
+    :param count: number of columns
+    :return: list of opening tags, one per column
+    """
+    alignments = alignments[:count] + ['center'] * (count - len(alignments))
+    return [f'{opening[:-1]} style="text-align: {alignment};">' for alignment in alignments]
+
+def render_table_row(row: list, cell_tags: list, cell_end: str, row_tags: tuple, links: dict = None) -> str:
+    """
+    Renders a table row.
+    :param row: list of Text cells
+    :param cell_tags: opening tags of the columns, at least one per cell
+    :param cell_end: closing tag of the cells
+    :param row_tags: opening and closing tags of the row
+    :param links: link definitions of the document, see link_definitions()
+    :return: row as HTML
+    """
+    parts = [row_tags[0]]
+    for tag, cell in zip(cell_tags, row):
+        source = cell.source
+        parts.append(tag)
+        parts.append(render_text(source, links) if INLINE_MARKUP_PATTERN.search(source) else source)
+        parts.append(cell_end)
+    parts.append(row_tags[1])
+    return "".join(parts)
+
+def render_task_list(node: TaskList, output: list, tags: tuple, links: dict = None,
+                     toc: TableOfContents = None) -> None:
+    """
+    Renders task lists
+    :param node: TaskList
+    :param output: list of HTML parts the formatted task list is appended to
+    :param tags: tag table, see compile_tags()
+    :param links: link definitions of the document, see link_definitions()
+    :param toc: table of contents the headers are added to
+    :return: None
+    """
+    for item in node.items:
+        if type(item) is Task:
+            opening, closing = tags[TAG_CHECKED] if item.checked else tags[TAG_UNCHECKED]
+            output.append(opening)
+            output.append(render_text(item.text.source, links))
+            output.append(closing)
+        else:
+            opening, closing = tags[TAG_NESTED_TASKS]
+            output.append(opening)
+            render_html(item.children, output, tags, links, toc)
+            output.append(closing)
+
+def render_toc(toc: TableOfContents, tags: tuple = None) -> str:
+    """
+    Renders a table of contents as nested lists of links to the headers, a level deeper for every header level.
+    :param toc: table of contents filled by a conversion, see convert()
+    :param tags: tag table, see compile_tags(). None for the tags of the configuration file.
+    :return: HTML of the table of contents, empty if there are no headers
+    """
+    if tags is None:
+        tags = load_tags()
+    list_opening, list_closing = tags[TAG_UL]
+    item_opening, item_closing = tags[TAG_LI]
+    output = []
+    levels = []  # levels of the open lists. Last is the innermost.
+    for level, anchor, text in toc.entries:
+        while levels and levels[-1] > level:
+            output.append(list_closing)
+            levels.pop()
+        if not levels or levels[-1] < level:
+            output.append(list_opening)
+            levels.append(level)
+        output.append(f'{item_opening}<a href="#{anchor}">{escape_html(text)}</a>{item_closing}')
+    output.extend(list_closing for _ in levels)
+    return "".join(output)
+
+def render_plain_text(nodes: list, links: dict = None) -> str:
+    """
+    Renders document tree nodes as plain text, e.g. for a search index.
+    Markup is removed, every block is on its own line and table cells are separated by tabs.
+    :param nodes: nodes returned by parse_lines() or parse_blocks()
+    :param links: link definitions of the document, see link_definitions()
+    :return: plain text
+    """
+    output = []
+    for node in walk(nodes):
+        node_type = type(node)
+        if node_type is Paragraph:
+            output.append(" ".join(plain_inline(child.source, links) for child in node.children if type(child) is Text))
+        elif node_type is Heading:
+            output.append(plain_inline(node.text.source, links))
+        elif node_type is List:
+            output.extend(plain_inline(item.source, links) for item in node.items if type(item) is Text)
+        elif node_type is Task:
+            output.append(plain_inline(node.text.source, links))
+        elif node_type is Table:
+            output.extend("\t".join(plain_inline(cell.source, links) for cell in row) for row in node.rows)
+        elif node_type is CodeBlock:
+            output.extend(node.lines)
+    return "\n".join(output) + "\n" if output else ""
+
+def list_headings(nodes: list, links: dict = None) -> list:
+    """
+    Lists the headers of a document, in the order of the document.
+    :param nodes: nodes returned by parse_lines() or parse_blocks()
+    :param links: link definitions of the document, see link_definitions()
+    :return: list of (level, plain text) tuples
+    """
+    return [(node.level, plain_inline(node.text.source, links)) for node in walk(nodes) if type(node) is Heading]
+
+def plain_inline(text: str, links: dict = None) -> str:
+    """
+    Converts inline Markdown to plain text, keeping the text of links, code and formatted parts.
+    :param text: inline Markdown
+    :param links: link definitions of the document, see link_definitions()
+    :return: text without markup
+    """
+    return INLINE_TAG_PATTERN.sub('', render_text(text, links))
+
+def walk(nodes: list) -> Iterator[Node]:
+    """
+    Iterates over the nodes and all their descendants, depth first, in the order of the document.
+    :param nodes: list of nodes
+    :return: iterator of nodes
+    """
+    for node in nodes:
+        yield node
+        if type(node) is List or type(node) is TaskList:
+            yield from walk(node.items)
+        else:
+            yield from walk(getattr(node, 'children', ()))
+
+def enable_stats() -> None:
+    """
+    Starts collecting call counts, wall time and input sizes of the functions in INSTRUMENTED_FUNCTIONS.
+    The functions are replaced by measuring wrappers in the module namespace, and put back by disable_stats(),
+    so there is no cost at all while the statistics are disabled. Clears the previous statistics.
+    :return: None
+    """
+    global STATS_INLINE_CACHE_SIZE
+    reset_stats()
+    if ORIGINAL_FUNCTIONS:
+        return
+    namespace = globals()
+    for name in INSTRUMENTED_FUNCTIONS:
+        ORIGINAL_FUNCTIONS[name] = namespace[name]
+        measure = measure_path if name in PATH_INPUT_FUNCTIONS else measure_input
+        namespace[name] = instrument(name, namespace[name], measure, name in STREAM_INPUT_FUNCTIONS)
+    # The inline memo holds a reference to the function it wraps, so it's rebuilt around the wrapper, in the same size.
+    STATS_INLINE_CACHE_SIZE = inline_cache_stats()['max_size']
+    set_inline_cache_size(STATS_INLINE_CACHE_SIZE)
+
+def disable_stats() -> None:
+    """
+    Stops collecting the statistics and puts the original functions back. The collected statistics are kept.
+    :return: None
+    """
+    if not ORIGINAL_FUNCTIONS:
+        return
+    globals().update(ORIGINAL_FUNCTIONS)
+    ORIGINAL_FUNCTIONS.clear()
+    set_inline_cache_size(STATS_INLINE_CACHE_SIZE)
+
+def reset_stats() -> None:
+    """
+    Clears the collected statistics.
+    :return: None
+    """
+    STATS.clear()
+
+def get_stats() -> dict:
+    """
+    Returns a copy of the collected statistics.
+    :return: dictionary: function name -> {'calls', 'total', 'max', 'lines', 'bytes'}. Times are in seconds.
+    """
+    return {name: dict(zip(STATS_FIELDS, values)) for name, values in STATS.items()}
+
+def merge_stats(stats: dict, other: dict) -> None:
+    """
+    Adds the statistics collected elsewhere (e.g. in a worker process) to the given statistics.
+    :param stats: statistics returned by get_stats(), updated in place
+    :param other: statistics to add
+    :return: None
+    """
+    for name, values in other.items():
+        if name not in stats:
+            stats[name] = dict(values)
+            continue
+        current = stats[name]
+        for field in ('calls', 'total', 'lines', 'bytes'):
+            current[field] += values[field]
+        current['max'] = max(current['max'], values['max'])
+
+def format_stats(stats: dict) -> str:
+    """
+    Formats the statistics as a table, the most expensive function first.
+    :param stats: statistics returned by get_stats()
+    :return: table as a string
+    """
+    rows = [f"{'function':<24} {'calls':>10} {'total [ms]':>12} {'mean [us]':>10} {'max [ms]':>10} {'lines':>10} {'bytes':>12}"]
+    for name, values in sorted(stats.items(), key=lambda item: item[1]['total'], reverse=True):
+        mean = values['total'] / values['calls'] * 1e6 if values['calls'] else 0
+        rows.append(f"{name:<24} {values['calls']:>10} {values['total'] * 1000:>12.1f} {mean:>10.1f} "
+                    f"{values['max'] * 1000:>10.2f} {values['lines']:>10} {values['bytes']:>12}")
+    return "\n".join(rows)
+
+def instrument(name: str, function, measure=None, counted: bool = False):
+    """
+    Wraps a function so every call is recorded in STATS.
+    A generator function is timed only while it runs, between the items it yields, so a lazy driver like iter_html()
+    is recorded the same way as handle_conversion(), without the time its consumer takes.
+    :param name: name the statistics are recorded under
+    :param function: function to wrap
+    :param measure: function measuring the input from the positional arguments, measure_input() by default
+    :param counted: the first argument is an iterable of lines, measured by a LineCounter as the lines are read
+    :return: wrapper function
+    """
+    if measure is None:
+        measure = measure_input
+    if function.__code__.co_flags & GENERATOR_FLAG:
+        @functools.wraps(function)
+        def generator_wrapper(*args, **kwargs):
+            if counted:
+                args = (LineCounter(args[0]),) + args[1:]
+            lines, size = measure(args)
+            elapsed = 0.0
+            iterator = function(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                iterator.close()
+                if counted:
+                    lines, size = args[0].lines, args[0].size
+                record_call(name, elapsed, lines, size)
+        return generator_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        # Measured before the call, as parsers move the offsets of the lines they are given.
+        lines, size = measure(args)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record_call(name, time.perf_counter() - start, lines, size)
+    return wrapper
+
+class LineCounter:
+    """
+    Iterator over lines counting the lines and characters read, for the statistics of a function that streams
+    its input, as the size of an iterable is only known once it has been read.
+    """
+    __slots__ = ('lines', 'size', '__iterator')
+
+    def __init__(self, lines: Iterable[str]) -> None:
+        self.lines = 0
+        self.size = 0
+        self.__iterator = iter(lines)
+
+    def __iter__(self) -> 'LineCounter':
+        return self
+
+    def __next__(self) -> str:
+        line = next(self.__iterator)
+        self.lines += 1
+        self.size += len(line)
+        return line
+
+def record_call(name: str, elapsed: float, lines: int, size: int) -> None:
+    """
+    Adds a call of an instrumented function to STATS.
+    :param name: name of the function
+    :param elapsed: wall time of the call in seconds
+    :param lines: number of input lines
+    :param size: size of the input
+    :return: None
+    """
+    values = STATS.get(name)
+    if values is None:
+        STATS[name] = [1, elapsed, elapsed, lines, size]
+    else:
+        values[0] += 1
+        values[1] += elapsed
+        if elapsed > values[2]:
+            values[2] = elapsed
+        values[3] += lines
+        values[4] += size
+
+def measure_input(args: tuple) -> tuple:
+    """
+    Measures the input of an instrumented function.
+    The input is taken from the arguments: a line (str), a list of lines, or a range of a line buffer.
+    :param args: positional arguments of the function
+    :return: (number of lines, number of characters)
+    """
+    value = args[0] if args else None
+    if isinstance(value, str):
+        return 1, len(value)
+    if isinstance(value, list):
+        # (lines, offsets, start, end) - a range of a line buffer
+        if len(args) == 4:
+            _, offsets, start, end = args
+            return end - start, sum(map(len, value[start:end])) - sum(offsets[start:end])
+        return len(value), sum(map(len, value))
+    return 0, 0
+
+def measure_path(args: tuple) -> tuple:
+    """
+    Measures the input of an instrumented function that takes the path of a file, e.g. convert_file().
+    :param args: positional arguments of the function, the path first
+    :return: (0, size of the file in bytes)
+    """
+    try:
+        return 0, os.path.getsize(args[0])
+    except OSError:
+        return 0, 0
@@ -0,0 +1,55 @@
+# Logger used by the converter
+# Nothing is logged until a logger is injected with set_logger(), so importing the package never touches the filesystem.
+
+class NullLogger:
+    """
+    Logger that drops all messages. Used until a real logger is set.
+    """
+
+    def debug(self, message: str, *args) -> None:
+        pass
+
+    def info(self, message: str, *args) -> None:
+        pass
+
+    def warn(self, message: str, *args) -> None:
+        pass
+
+    def error(self, message: str, *args) -> None:
+        pass
+
+    def critical(self, message: str, *args) -> None:
+        pass
+
+    def is_enabled_for(self, level: int) -> bool:
+        return False
+
+class LoggerProxy:
+    """
+    Forwards all calls to the current logger, so modules can keep a reference to the proxy
+    while the logger itself is replaced by set_logger().
+    """
+    __slots__ = ('target',)
+
+    def __init__(self, target) -> None:
+        self.target = target
+
+    def __getattr__(self, name: str):
+        return getattr(self.target, name)
+
+log = LoggerProxy(NullLogger())
+
+def set_logger(logger) -> None:
+    """
+    Sets the logger used by the converter, e.g. a simple_logger.LOG.
+    :param logger: object with debug, info, warn, error and critical methods, None to stop logging
+    :return: None
+    """
+    log.target = NullLogger() if logger is None else logger
+
+def get_logger():
+    """
+    Returns the logger used by the converter.
+    :return: current logger, a NullLogger when none was set
+    """
+    return log.target
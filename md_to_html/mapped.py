@@ -0,0 +1,162 @@
+# Memory-mapped input
+# Lines of a Markdown file read through a memory map, for inputs too large to be held as a list of strings.
+
+# imports
+import itertools, mmap, os, re
+from array import array
+from collections.abc import Iterator
+
+INDEX_CHUNK_BYTES = 64 * 1024  # bytes of the file split into lines at once while the index is built
+RELEASE_BYTES = 4 * 1024 * 1024  # pages this far behind the furthest line read are given back to the system
+
+class MappedLines:
+    """
+    Lines of a UTF-8 file, used in place of the list returned by readlines(), e.g. by iter_nodes() or RenderCache.
+    The file is memory-mapped, and only the start of every line is kept, in a compact array built in one scan
+    when it's first needed. A line is decoded when it's read, so the parsers hold only the lines of the current block.
+    Line endings are normalized to \\n, as in a file opened in text mode.
+    The index costs 8 bytes per line and stays in memory as long as the lines do, so for a file that is only read
+    once from start to end, iterating over the open file uses less memory. The map pays off for random access.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Maps a file.
+        :param path: path to the Markdown file
+        :return: None
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            # An empty file can't be mapped.
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.__starts = None  # start of every line, then the size of the file, see __index()
+        self.__carriage_returns = False  # the file has \r line endings that must be normalized
+        self.__released = 0  # pages before this offset were given back while reading, see __line()
+
+    def __len__(self) -> int:
+        return len(self.__index()) - 1
+
+    def __getitem__(self, index):
+        """
+        :param index: index of a line, or a slice
+        :return: the line, or a list of lines for a slice
+        """
+        if type(index) is slice:
+            return [self.__line(i) for i in range(*index.indices(len(self)))]
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("line index out of range")
+        return self.__line(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.__line(i)
+
+    def __enter__(self) -> 'MappedLines':
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmaps the file. The lines can't be read anymore.
+        :return: None
+        """
+        if type(self.__map) is mmap.mmap:
+            self.__map.close()
+
+    def iter_lines_starting_with(self, prefixes: tuple) -> Iterator[str]:
+        """
+        Finds the lines that start with one of the prefixes, e.g. for a scan ahead of the conversion.
+        The bytes of the file are searched by one compiled pattern a chunk at a time, so the other lines
+        are never decoded and the index doesn't have to be built.
+        :param prefixes: starts of the lines, ASCII strings
+        :return: iterator of the lines, with their line break normalized to \\n
+        """
+        starts = b"|".join(re.escape(prefix.encode()) for prefix in prefixes)
+        pattern = re.compile(rb"^(?:" + starts + rb")[^\r\n]*", re.MULTILINE)
+        # With \r line endings, a line also starts after a lone \r. The \r of a \r\n is followed by \n,
+        # which starts no prefix. Only used for the chunks with a \r, as the look-behind is much slower.
+        carriage_return_pattern = re.compile(rb"(?:^|(?<=\r))(?:" + starts + rb")[^\r\n]*", re.MULTILINE)
+        data = self.__map
+        position = 0
+        size = len(data)
+        while position < size:
+            end = data.find(b"\n", min(position + INDEX_CHUNK_BYTES, size)) + 1 or size
+            chunk_pattern = carriage_return_pattern if data.find(b"\r", position, end) >= 0 else pattern
+            for line in chunk_pattern.findall(data, position, end):
+                yield line.decode('utf-8') + "\n"
+            self.__release(position, end)
+            position = end
+
+    def __index(self) -> array:
+        """
+        Private method that returns the index of the lines, building it on first use.
+        The file is split into lines by bytes.splitlines() a chunk at a time, and the lengths of the lines
+        are summed into their offsets, so no Python code runs per line. Like a file in text mode, it splits
+        at \\n, \\r\\n and \\r.
+        :return: array of the offsets of the lines, followed by the size of the file
+        """
+        if self.__starts is not None:
+            return self.__starts
+        data = self.__map
+        starts = array('Q')
+        position = 0
+        size = len(data)
+        while position < size:
+            if position + INDEX_CHUNK_BYTES >= size:
+                end = size
+            else:
+                # Chunks end after a line break, so a \r\n is never split.
+                end = data.rfind(b"\n", position, position + INDEX_CHUNK_BYTES) + 1
+                if end == 0:
+                    # No line break in the whole chunk, the line is longer than the chunk.
+                    end = data.find(b"\n", position + INDEX_CHUNK_BYTES) + 1 or size
+            chunk = data[position:end]
+            if not self.__carriage_returns and b"\r" in chunk:
+                self.__carriage_returns = True
+            starts.extend(itertools.accumulate(map(len, chunk.splitlines(keepends=True)), initial=position))
+            starts.pop()  # the end of the chunk is the start of the next one
+            self.__release(position, end)
+            position = end
+        starts.append(size)
+        self.__starts = starts
+        return starts
+
+    def __line(self, index: int) -> str:
+        """
+        Private method that decodes a line.
+        :param index: index of the line
+        :return: line with its line break
+        """
+        end = self.__starts[index + 1]
+        if end > self.__released + 2 * RELEASE_BYTES:
+            self.__release(self.__released, end - RELEASE_BYTES)
+            self.__released = end - RELEASE_BYTES
+        line = str(self.__map[self.__starts[index]:end], 'utf-8')
+        if self.__carriage_returns:
+            if line.endswith("\r\n"):
+                line = line[:-2] + "\n"
+            elif line.endswith("\r"):
+                line = line[:-1] + "\n"
+        return line
+
+    def __release(self, start: int, end: int) -> None:
+        """
+        Private method that gives the pages of a range of the file back to the system, so the memory use
+        of the process doesn't grow with the size of the file. The pages are read again if they are needed.
+        Only whole pages inside the range are released.
+        :param start: offset of the range
+        :param end: offset after the range
+        :return: None
+        """
+        if type(self.__map) is not mmap.mmap or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+        end -= end % mmap.PAGESIZE
+        if end > start:
+            self.__map.madvise(mmap.MADV_DONTNEED, start, end - start)
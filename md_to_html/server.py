@@ -0,0 +1,284 @@
+# Render server
+# Local HTTP/1.1 service converting Markdown sent by POST requests, for previews that can't pay the startup
+# of a new process for every document. Built on asyncio streams, conversions run on a process pool.
+#
+#   POST /render   Markdown in the body, HTML in the response
+#   POST /batch    JSON list of Markdown documents, JSON list of HTML documents in the response
+#   GET  /stats    JSON with the counters of the server and of its cache
+
+# imports
+import asyncio, functools, hashlib, json, os, signal, sys, time
+from collections import OrderedDict
+from http import HTTPStatus
+from . import converter
+from .logger import log
+
+CACHE_BYTES = 64 * 1024 * 1024  # default size of the rendered documents kept in the cache
+MAX_BODY_BYTES = 32 * 1024 * 1024  # larger requests are refused
+KEEP_ALIVE_TIMEOUT = 15.0  # seconds an idle connection is kept open
+MAX_HEADER_BYTES = 64 * 1024  # limit of the request line and headers, the default limit of asyncio streams
+
+def serve(host: str = '127.0.0.1', port: int = 8000, jobs: int = None, cache_bytes: int = CACHE_BYTES) -> int:
+    """
+    Runs the render server until it's interrupted (Ctrl+C or SIGTERM).
+    :param host: address to listen on, only the local machine by default
+    :param port: port to listen on, 0 for any free port. The address is printed when the server is ready.
+    :param jobs: number of worker processes (default: CPU count)
+    :param cache_bytes: maximum total size of the rendered documents kept in the cache, 0 disables the cache
+    :return: 0 - Success, 1 - The server couldn't be started
+    """
+    # Imported here, as in the batch build: the process pool is slow to import and only needed by the server.
+    import concurrent.futures
+    jobs = jobs or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        # The pool forks a worker for every task submitted while no worker is idle. They are all forked here,
+        # before the server listens, so no worker inherits the listening socket or a client connection.
+        concurrent.futures.wait([executor.submit(os.getpid) for _ in range(jobs)])
+        service = RenderService(executor, cache_bytes)
+        try:
+            asyncio.run(run_server(service, host, port))
+        except KeyboardInterrupt:
+            pass
+        except OSError as e:
+            log.error(f"Cannot start the server on {host}:{port}: {e}")
+            print(f"Cannot start the server on {host}:{port}: {e}", file=sys.stderr)
+            return 1
+    log.info("Server stopped.")
+    return 0
+
+async def run_server(service: 'RenderService', host: str, port: int) -> None:
+    """
+    Accepts connections until SIGINT or SIGTERM is received.
+    :param service: service rendering the documents
+    :param host: address to listen on
+    :param port: port to listen on
+    :return: None
+    """
+    server = await asyncio.start_server(functools.partial(handle_connection, service), host, port,
+                                        limit=MAX_HEADER_BYTES)
+    addresses = ", ".join("http://%s:%d" % socket.getsockname()[:2] for socket in server.sockets)
+    log.info(f"Serving on {addresses}")
+    print(f"Serving on {addresses}", flush=True)
+
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, lambda: stopped.done() or stopped.set_result(None))
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+    async with server:
+        await stopped
+
+class RenderService:
+    """
+    Renders Markdown documents on a process pool, so the event loop never waits for a conversion.
+    The HTML is kept in an LRU keyed by the hash of the Markdown and bounded by its total size,
+    and dropped when the configuration file changes.
+    A document that is already being rendered for another request is not rendered twice.
+    """
+
+    def __init__(self, executor, max_bytes: int = CACHE_BYTES) -> None:
+        """
+        Initialize the service.
+        :param executor: executor running the conversions, e.g. a ProcessPoolExecutor
+        :param max_bytes: maximum total size of the cached HTML, 0 disables the cache
+        :return: None
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0  # requests that waited for the same document requested by another one
+        self.evictions = 0
+        self.__executor = executor
+        self.__results = OrderedDict()  # document hash -> HTML, the least recently used first
+        self.__size = 0  # total size of the cached HTML
+        self.__tags = None  # tag table of the configuration the cached HTML was rendered with
+        self.__pending = {}  # document hash -> future of the conversion running in the pool
+
+    async def render(self, markdown: bytes) -> tuple:
+        """
+        Converts a Markdown document to HTML.
+        :param markdown: Markdown document, UTF-8 encoded
+        :return: (HTML, UTF-8 encoded, True if the HTML was found in the cache)
+        """
+        tags = converter.load_tags()
+        if tags is not self.__tags:
+            self.__results.clear()
+            self.__size = 0
+            self.__tags = tags
+        key = hashlib.blake2b(markdown, digest_size=16).digest()
+        html = self.__results.get(key)
+        if html is not None:
+            self.hits += 1
+            self.__results.move_to_end(key)
+            return html, True
+        future = self.__pending.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.get_running_loop().run_in_executor(self.__executor, render_document, markdown)
+            self.__pending[key] = future
+            future.add_done_callback(functools.partial(self.__finish, key))
+        else:
+            self.coalesced += 1
+        # Shielded, so a client that disconnects doesn't cancel the conversion awaited by the others.
+        return await asyncio.shield(future), False
+
+    def __finish(self, key: bytes, future: asyncio.Future) -> None:
+        """
+        Private method called when a conversion is done. Stores its HTML in the cache.
+        :param key: document hash
+        :param future: future of the conversion
+        :return: None
+        """
+        del self.__pending[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        html = future.result()
+        if len(html) > self.max_bytes:
+            return
+        self.__results[key] = html
+        self.__size += len(html)
+        while self.__size > self.max_bytes:
+            _, evicted = self.__results.popitem(last=False)
+            self.__size -= len(evicted)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+        :return: dictionary with hits, misses, coalesced, evictions, size, bytes and hit_rate
+        """
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'size': len(self.__results),
+            'bytes': self.__size,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+def render_document(markdown: bytes) -> bytes:
+    """
+    Converts a UTF-8 encoded Markdown document. Runs in the worker processes of the server.
+    :param markdown: Markdown document, UTF-8 encoded
+    :return: HTML, UTF-8 encoded
+    """
+    return converter.convert(markdown.decode('utf-8')).encode('utf-8')
+
+async def handle_connection(service: RenderService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Serves the requests of one connection. HTTP/1.1 connections are kept open between requests
+    until the client asks to close them or they are idle for KEEP_ALIVE_TIMEOUT seconds.
+    :param service: service rendering the documents
+    :param reader: stream of the connection
+    :param writer: stream of the connection
+    :return: None
+    """
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                break
+            except asyncio.LimitOverrunError:
+                await send_response(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, b"Headers too large\n")
+                break
+            request_line, *header_lines = head.decode('latin-1').split("\r\n")
+            parts = request_line.split(" ")
+            if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+                await send_response(writer, HTTPStatus.BAD_REQUEST, b"Malformed request line\n")
+                break
+            method, target, version = parts
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+            if 'transfer-encoding' in headers:
+                await send_response(writer, HTTPStatus.NOT_IMPLEMENTED, b"Transfer-Encoding is not supported\n")
+                break
+            try:
+                length = int(headers.get('content-length', '0'))
+            except ValueError:
+                length = -1
+            if length < 0:
+                await send_response(writer, HTTPStatus.BAD_REQUEST, b"Invalid Content-Length\n")
+                break
+            if length > MAX_BODY_BYTES:
+                await send_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, b"Request body too large\n")
+                break
+            if length and headers.get('expect', '').lower() == '100-continue':
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            body = await reader.readexactly(length) if length else b""
+
+            start = time.perf_counter()
+            status, content_type, response, extra_headers = await handle_request(service, method, target, body)
+            log.debug("%s %s %d %.1f ms", method, target, status, (time.perf_counter() - start) * 1000)
+            await send_response(writer, status, response, content_type, keep_alive, extra_headers)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def handle_request(service: RenderService, method: str, target: str, body: bytes) -> tuple:
+    """
+    Routes a request to its endpoint.
+    :param service: service rendering the documents
+    :param method: HTTP method
+    :param target: request target, the query string is ignored
+    :param body: request body
+    :return: (status, content type, response body, extra headers)
+    """
+    path = target.partition("?")[0]
+    endpoints = {'/render': 'POST', '/batch': 'POST', '/stats': 'GET'}
+    if path not in endpoints:
+        return HTTPStatus.NOT_FOUND, 'text/plain', b"Not found\n", {}
+    if method != endpoints[path]:
+        return HTTPStatus.METHOD_NOT_ALLOWED, 'text/plain', b"Method not allowed\n", {'Allow': endpoints[path]}
+
+    try:
+        if path == '/render':
+            html, cached = await service.render(body)
+            return HTTPStatus.OK, 'text/html; charset=utf-8', html, {'X-Cache': 'hit' if cached else 'miss'}
+        if path == '/batch':
+            documents = json.loads(body)
+            if not isinstance(documents, list) or not all(isinstance(document, str) for document in documents):
+                return HTTPStatus.BAD_REQUEST, 'text/plain', b"Expected a JSON list of Markdown documents\n", {}
+            results = await asyncio.gather(*(service.render(document.encode('utf-8')) for document in documents))
+            response = json.dumps([html.decode('utf-8') for html, _ in results]).encode('utf-8')
+            return HTTPStatus.OK, 'application/json', response, {}
+        return HTTPStatus.OK, 'application/json', json.dumps(service.stats()).encode('utf-8'), {}
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        return HTTPStatus.BAD_REQUEST, 'text/plain', f"Invalid request body: {e}\n".encode('utf-8'), {}
+    except Exception as e:
+        log.error(f"Failed to render a request to {path}: {type(e).__name__}: {e}")
+        return HTTPStatus.INTERNAL_SERVER_ERROR, 'text/plain', b"Conversion failed\n", {}
+
+async def send_response(writer: asyncio.StreamWriter, status: HTTPStatus, body: bytes, content_type: str = 'text/plain',
+                        keep_alive: bool = False, extra_headers: dict = None) -> None:
+    """
+    Writes an HTTP/1.1 response.
+    :param writer: stream of the connection
+    :param status: HTTP status
+    :param body: response body
+    :param content_type: content type of the body
+    :param keep_alive: keep the connection open after the response
+    :param extra_headers: additional headers
+    :return: None
+    """
+    head = [f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    for name, value in (extra_headers or {}).items():
+        head.append(f"{name}: {value}")
+    writer.writelines((("\r\n".join(head) + "\r\n\r\n").encode('latin-1'), body))
+    await writer.drain()
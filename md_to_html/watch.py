@@ -0,0 +1,414 @@
+# Watch mode
+# Converts the Markdown files of a directory tree again as soon as they are saved. On Linux the changes are reported
+# by inotify (through ctypes), so an idle watch doesn't use any CPU. Elsewhere the tree is polled with a stat cache.
+
+# imports
+import os, select, struct, sys, time
+from . import converter
+from .converter import MARKDOWN_EXTENSIONS
+from .logger import log
+
+DEBOUNCE = 0.05  # seconds without a new change before a burst of changes is converted
+MAX_DELAY = 0.5  # seconds after which a burst is converted even if the changes go on
+POLL_INTERVAL = 0.1  # seconds between two checks of the tree when polling, see PollingWatcher
+FULL_SCAN_INTERVAL = 10.0  # seconds in which every file of the tree is checked when polling
+DIRECTORY_CHECK_INTERVAL = 1.0  # seconds in which the modification time of every directory is checked when polling
+RECENT_FILES = 64  # number of recently changed files checked at every poll
+
+# inotify constants, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')  # struct inotify_event: wd, mask, cookie, len, followed by the name
+
+def watch_directory(source_dir: str, output_dir: str, debounce: float = DEBOUNCE, interval: float = POLL_INTERVAL,
+                    polling: bool = False) -> int:
+    """
+    Builds the directory tree, then converts every Markdown file again when it's saved, until interrupted.
+    The HTML of deleted files is removed. Bursts of saves (e.g. a whole project saved at once) are collected
+    until no file changed for the debounce time, and every changed file is converted once.
+    :param source_dir: directory with the Markdown files
+    :param output_dir: directory for the HTML files
+    :param debounce: seconds without a new change before the changes are converted
+    :param interval: seconds between two checks of the tree, when polling
+    :param polling: poll the tree even when inotify is available
+    :return: 0 - Stopped by the user, 1 - The source directory doesn't exist
+    """
+    if not os.path.isdir(source_dir):
+        log.error(f"Source directory does not exist: {source_dir}")
+        print(f"Source directory does not exist: {source_dir}", file=sys.stderr)
+        return 1
+    from .build import build_directory
+
+    # The watch starts before the build, so a file saved during the build is not missed.
+    watcher = None
+    if not polling:
+        try:
+            watcher = InotifyWatcher(source_dir)
+        except OSError as e:
+            log.warn(f"inotify is not available, polling the directory instead: {e}")
+    if watcher is None:
+        watcher = PollingWatcher(source_dir, interval)
+
+    try:
+        build_directory(source_dir, output_dir)
+        log.info(f"Watching {source_dir} with {type(watcher).__name__}.")
+        print(f"Watching {source_dir} for changes, press Ctrl+C to stop.", flush=True)
+        while True:
+            changes = wait_for_changes(watcher, debounce)
+            if changes is None:
+                # Changes were lost (inotify queue overflow), the build finds them from the manifest.
+                log.warn("Too many changes at once, building the whole directory again.")
+                build_directory(source_dir, output_dir)
+                continue
+            apply_changes(source_dir, output_dir, changes)
+    except KeyboardInterrupt:
+        log.info("Watch stopped.")
+        return 0
+    finally:
+        watcher.close()
+
+def wait_for_changes(watcher, debounce: float) -> dict:
+    """
+    Waits for the next burst of changes. The burst ends when nothing changed for the debounce time,
+    or MAX_DELAY after its first change.
+    :param watcher: InotifyWatcher or PollingWatcher
+    :param debounce: seconds without a new change that end the burst
+    :return: relative path -> True if the file changed, False if it was removed. None if changes were lost.
+    """
+    changes = watcher.poll(None)
+    deadline = time.monotonic() + MAX_DELAY
+    while changes is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        more = watcher.poll(min(debounce, remaining))
+        if more is None:
+            return None
+        if not more:
+            break
+        changes.update(more)  # the last change of a file wins
+    return changes
+
+def apply_changes(source_dir: str, output_dir: str, changes: dict) -> None:
+    """
+    Converts the changed files and removes the HTML of the removed ones.
+    :param source_dir: directory with the Markdown files
+    :param output_dir: directory for the HTML files
+    :param changes: relative path -> True if the file changed, False if it was removed
+    :return: None
+    """
+    for path, changed in sorted(changes.items()):
+        output_path = os.path.join(output_dir, os.path.splitext(path)[0] + '.html')
+        if not changed:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+                print(f"Removed {output_path}", flush=True)
+            continue
+        start = time.perf_counter()
+        try:
+            converter.convert_file(os.path.join(source_dir, path), output_path)
+        except FileNotFoundError:
+            continue  # removed again before it was converted, the removal follows
+        except Exception as e:
+            log.error("Failed to convert %s: %s", path, e)
+            print(f"FAILED {path}: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+            continue
+        print(f"Converted {path} in {(time.perf_counter() - start) * 1000:.0f} ms", flush=True)
+
+class PollingWatcher:
+    """
+    Finds changes by polling modification times, with a stat cache of the tree. Every interval:
+    - the directories of the recently changed files and a slice of the other directories are checked, so every
+      directory is checked within DIRECTORY_CHECK_INTERVAL. A directory is listed again only when its modification
+      time changed (a file was added, removed or renamed, which includes the saves that write a temporary file
+      and rename it),
+    - the recently changed files are checked, as they are the ones being edited,
+    - a slice of the directories is listed again, so every file written in place is found within FULL_SCAN_INTERVAL.
+    """
+
+    def __init__(self, source_dir: str, interval: float = POLL_INTERVAL) -> None:
+        """
+        Initialize the watcher with the current state of the tree.
+        :param source_dir: directory to watch
+        :param interval: seconds between two checks
+        :return: None
+        """
+        self.source_dir = source_dir
+        self.interval = interval
+        self.__directories = {}  # relative path of every directory -> (absolute path, modification time)
+        self.__files = {}  # relative path of every directory -> {name of a Markdown file: (mtime, size)}
+        self.__recent = {}  # relative paths of the recently changed files, the oldest first
+        self.__cursor = 0  # index of the next directory listed by the full scan
+        self.__check_cursor = 0  # index of the next directory whose modification time is checked
+        self.__scan_directory('', {})
+
+    def poll(self, timeout: float = None) -> dict:
+        """
+        Waits and checks the tree.
+        :param timeout: seconds to wait, None to check every interval until something changed
+        :return: relative path -> True if the file changed, False if it was removed
+        """
+        while True:
+            time.sleep(self.interval if timeout is None else timeout)
+            changes = {}
+            self.__check_directories(changes)
+            for path in self.__recent:
+                directory, name = os.path.split(path)
+                try:
+                    stat = os.stat(os.path.join(self.source_dir, path))
+                except OSError:
+                    continue  # removed, found by the check of its directory
+                files = self.__files.get(directory)
+                if files is not None and files.get(name) != (stat.st_mtime_ns, stat.st_size):
+                    files[name] = (stat.st_mtime_ns, stat.st_size)
+                    changes[path] = True
+            self.__scan_slice(changes)
+
+            for path, changed in changes.items():
+                self.__recent.pop(path, None)
+                if changed:
+                    self.__recent[path] = None
+            while len(self.__recent) > RECENT_FILES:
+                del self.__recent[next(iter(self.__recent))]
+            if changes or timeout is not None:
+                return changes
+
+    def __check_directories(self, changes: dict) -> None:
+        """
+        Private method checking the modification times of the directories with recently changed files and of
+        the next slice of the other directories, sized so every directory is checked every DIRECTORY_CHECK_INTERVAL.
+        A directory whose modification time changed is listed again.
+        :param changes: dictionary the changes are added to
+        :return: None
+        """
+        checked = {os.path.dirname(path) for path in self.__recent}
+        directories = list(self.__directories)
+        count = -(-len(directories) * self.interval // DIRECTORY_CHECK_INTERVAL)  # rounded up
+        for _ in range(int(min(count, len(directories)))):
+            self.__check_cursor %= len(directories)
+            checked.add(directories[self.__check_cursor])
+            self.__check_cursor += 1
+        for directory in checked:
+            known = self.__directories.get(directory)
+            if known is None:
+                continue  # removed with its parent meanwhile
+            try:
+                changed = os.stat(known[0]).st_mtime_ns != known[1]
+            except OSError:
+                changed = True
+            if changed:
+                self.__scan_directory(directory, changes)
+
+    def __scan_slice(self, changes: dict) -> None:
+        """
+        Private method listing the next slice of the directories, sized so the whole tree is listed
+        every FULL_SCAN_INTERVAL.
+        :param changes: dictionary the changes are added to
+        :return: None
+        """
+        directories = list(self.__directories)
+        count = -(-len(directories) * self.interval // FULL_SCAN_INTERVAL)  # rounded up
+        for _ in range(int(min(count, len(directories)))):
+            self.__cursor %= len(directories)
+            directory = directories[self.__cursor]
+            self.__cursor += 1
+            if directory in self.__directories:
+                self.__scan_directory(directory, changes)
+
+    def __scan_directory(self, directory: str, changes: dict) -> None:
+        """
+        Private method listing a directory with os.scandir() and comparing its Markdown files with the stat cache.
+        New subdirectories are listed too, and a directory that doesn't exist anymore is removed with its files.
+        :param directory: relative path of the directory
+        :param changes: dictionary the changes are added to
+        :return: None
+        """
+        absolute_path = os.path.join(self.source_dir, directory)
+        files = {}
+        subdirectories = []
+        try:
+            mtime = os.stat(absolute_path).st_mtime_ns  # before the listing, so a change during the listing is seen later
+            with os.scandir(absolute_path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(MARKDOWN_EXTENSIONS):
+                        stat = entry.stat()
+                        files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                    elif entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(os.path.join(directory, entry.name))
+        except (FileNotFoundError, NotADirectoryError):
+            self.__remove_directory(directory, changes)
+            return
+        previous = self.__files.get(directory, {})
+        for name, state in files.items():
+            if previous.get(name) != state:
+                changes[os.path.join(directory, name)] = True
+        for name in previous.keys() - files.keys():
+            changes[os.path.join(directory, name)] = False
+        self.__files[directory] = files
+        self.__directories[directory] = (absolute_path, mtime)
+        for subdirectory in subdirectories:
+            if subdirectory not in self.__directories:
+                self.__scan_directory(subdirectory, changes)
+
+    def __remove_directory(self, directory: str, changes: dict) -> None:
+        """
+        Private method forgetting a removed directory and its subdirectories. Their files are reported as removed.
+        :param directory: relative path of the directory
+        :param changes: dictionary the changes are added to
+        :return: None
+        """
+        prefix = directory + os.sep
+        for removed in [path for path in self.__directories if path == directory or path.startswith(prefix)]:
+            for name in self.__files.pop(removed, ()):
+                changes[os.path.join(removed, name)] = False
+            del self.__directories[removed]
+
+    def close(self) -> None:
+        pass
+
+class InotifyWatcher:
+    """
+    Finds changes with inotify, called through ctypes. Every directory of the tree is watched, files are
+    reported when they are closed after writing or moved, so a file is never converted while it's being saved.
+    """
+
+    def __init__(self, source_dir: str) -> None:
+        """
+        Initialize the watcher and watch every directory of the tree.
+        :param source_dir: directory to watch
+        :return: None
+        """
+        import ctypes  # only needed by the watch mode
+        self.source_dir = source_dir
+        self.__libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(self.__libc, 'inotify_init1'):
+            raise OSError("inotify is only available on Linux")
+        self.__get_errno = ctypes.get_errno
+        self.__fd = self.__libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.__fd < 0:
+            self.__raise_errno()
+        self.__directories = {}  # watch descriptor -> relative path of the directory
+        self.__files = set()  # relative paths of the known Markdown files, to remove the HTML of a removed directory
+        try:
+            self.__add_tree('')
+        except OSError:
+            self.close()
+            raise
+
+    def __raise_errno(self) -> None:
+        """
+        Private method raising the error of the last libc call.
+        :return: None
+        """
+        errno = self.__get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+    def __add_tree(self, path: str) -> list:
+        """
+        Private method watching a directory and all its subdirectories.
+        :param path: relative path of the directory
+        :return: relative paths of the Markdown files found in the tree
+        """
+        found = []
+        directories = [path]
+        while directories:
+            path = directories.pop()
+            absolute_path = os.path.join(self.source_dir, path)
+            wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(absolute_path), WATCH_MASK)
+            if wd < 0:
+                if self.__get_errno() in (2, 20):  # ENOENT, ENOTDIR: removed in the meantime
+                    continue
+                self.__raise_errno()  # e.g. ENOSPC: more directories than fs.inotify.max_user_watches
+            self.__directories[wd] = path
+            try:
+                with os.scandir(absolute_path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            directories.append(os.path.join(path, entry.name))
+                        elif entry.name.endswith(MARKDOWN_EXTENSIONS):
+                            found.append(os.path.join(path, entry.name))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+        self.__files.update(found)
+        return found
+
+    def poll(self, timeout: float = None) -> dict:
+        """
+        Waits for events and translates them to changed files.
+        :param timeout: seconds to wait, None to wait until something changed
+        :return: relative path -> True if the file changed, False if it was removed. None if events were lost.
+        """
+        changes = {}
+        while True:
+            ready, _, _ = select.select([self.__fd], [], [], timeout)
+            if not ready:
+                return changes
+            try:
+                data = os.read(self.__fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            if self.__read_events(data, changes) is None:
+                return None
+            if changes or timeout is not None:
+                return changes
+
+    def __read_events(self, data: bytes, changes: dict) -> dict:
+        """
+        Private method translating a buffer of inotify events.
+        :param data: events read from the inotify descriptor
+        :param changes: dictionary the changes are added to
+        :return: the changes, None if the event queue overflowed
+        """
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self.__directories.pop(wd, None)
+                continue
+            directory = self.__directories.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changes.update(dict.fromkeys(self.__add_tree(path), True))
+                elif mask & IN_MOVED_FROM:
+                    # A moved directory is not removed from the watches, its events are ignored from now on.
+                    prefix = path + os.sep
+                    for moved_wd, watched in list(self.__directories.items()):
+                        if watched == path or watched.startswith(prefix):
+                            del self.__directories[moved_wd]
+                    removed = [file for file in self.__files if file.startswith(prefix)]
+                    self.__files.difference_update(removed)
+                    changes.update(dict.fromkeys(removed, False))
+                continue
+            if not name.endswith(MARKDOWN_EXTENSIONS):
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self.__files.add(path)
+                changes[path] = True
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self.__files.discard(path)
+                changes[path] = False
+        return changes
+
+    def close(self) -> None:
+        """
+        Stops watching. The watches are removed along with the descriptor.
+        :return: None
+        """
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
@@ -1,16 +1,35 @@
 from datetime import datetime
+import atexit
 import os
+import queue
+import threading
+import time
+
+# Log levels. A message is logged if its level is equal or higher than the level of the logger.
+DEBUG = 0
+INFO = 1
+WARN = 2
+ERROR = 3
+CRITICAL = 4
+
+LEVEL_NAMES = ('DEBUG', 'INFO', 'WARN', 'ERROR', 'CRITICAL')
 
 
 class LOG:
     """
     Object for logging messages to a file. Can be used to log debug, info, warn, error and critical messages.
+
+    Messages are buffered and written through a single open file handle. The buffer is flushed when it grows over
+    buffer_size, at the latest flush_interval seconds after a message was buffered (by a timer), and at exit,
+    including the exit of a forked worker process.
+    With background=True, the writing is done by a separate thread, so logging never waits for the disk.
     """
     __file = str # Path to the current log file
     __filepath = str # Path to the directory where the log files are stored
     __level = 0 # Log level. Higher values mean less massages. Can be changes by self.set_level()
 
-    def __init__(self, level: int = 1, filename: str = 'latest.log', filepath: str = 'logs/') -> None:
+    def __init__(self, level: int = 1, filename: str = 'latest.log', filepath: str = 'logs/',
+                 buffer_size: int = 64 * 1024, flush_interval: float = 1.0, background: bool = False) -> None:
         """
         Initialize the logger. Run when the class is created.
 
@@ -20,6 +39,9 @@ class LOG:
         :param filename: Path to the log file. 'latest.log' by default.
         :param filepath: Path to the directory where the log files are stored. 'logs/' by default.
         Should be ending with /
+        :param buffer_size: Number of buffered characters after which the buffer is written to the file.
+        :param flush_interval: Maximum number of seconds a message is kept in the buffer.
+        :param background: Write the messages from a background thread.
         :return: None
         """
         if level not in range(0, 5):
@@ -28,9 +50,27 @@ class LOG:
         self.__filepath = filepath
         self.__file = filepath + filename
         self.__level = level
-        with open(self.__file, 'w') as f:
-            f.write(self.__get_full_time() + '\n')
-            f.close()
+        self.__buffer_size = buffer_size
+        self.__flush_interval = flush_interval
+        self.__background = background
+        self.__lock = threading.Lock()
+        self.__buffer = [] # Records waiting to be written: (time, level, message)
+        self.__buffered = 0 # Approximate number of characters in the buffer
+        self.__last_flush = time.monotonic()
+        self.__timer = None # Timer flushing the buffer flush_interval seconds after a message was buffered
+        self.__forked = False # Forked child without an exit finalizer yet, see self.__after_fork()
+        self.__queue = None
+        self.__thread = None
+        self.__second = None # Last second formatted by self.__format_record()
+        self.__second_text = ''
+        self.__handle = open(self.__file, 'w', encoding='utf-8')
+        self.__handle.write(self.__get_full_time() + '\n')
+        if background:
+            self.__start_thread()
+        atexit.register(self.close)
+        # A forked process (e.g. a worker of a process pool) must not write the records of its parent again.
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self.flush, after_in_child=self.__after_fork)
         self.debug('Logger initialized')
 
     @staticmethod
@@ -51,68 +91,231 @@ class LOG:
         """
         return datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
 
-    @staticmethod
-    def __get_short_time() -> str:
+    def __format_record(self, record: tuple) -> str:
         """
-        Private method to get the current time in the format 'HH:MM:SS.MS'
-        :return: string - current time
+        Private method to format a buffered record as a line of the log file. Time is formatted as 'HH:MM:SS.MS'
+        The 'HH:MM:SS' part is computed once per second.
+        :param record: (time, level, message)
+        :return: string - log line
         """
-        return datetime.now().strftime('%H:%M:%S.%f')
+        timestamp, level, message = record
+        seconds = int(timestamp)
+        if seconds != self.__second:
+            self.__second = seconds
+            self.__second_text = time.strftime('%H:%M:%S', time.localtime(seconds))
+        return f'[{self.__second_text}.{int((timestamp - seconds) * 1e6):06d}] [{LEVEL_NAMES[level]}]:\t{message}\n'
 
-    def debug(self, message: str) -> None:
+    def is_enabled_for(self, level: int) -> bool:
+        """
+        Checks if messages of the given level would be logged. Use it to skip building expensive messages.
+        :param level: Log level of the message. Expected values: 0-4
+        :return: True if the message would be logged
+        """
+        return level >= self.__level
+
+    def __log(self, level: int, message: str, args: tuple) -> None:
+        """
+        Private method to add a message to the buffer. The message is formatted only here, after the level check.
+        :param level: Log level of the message
+        :param message: log message, formatted with the % operator when args are given
+        :param args: arguments for the message
+        :return: None
+        """
+        if args:
+            message = message % args
+        record = (time.time(), level, message)
+        if self.__forked:
+            # Registered here, as a new worker process clears the finalizers after the fork handlers ran.
+            self.__forked = False
+            import multiprocessing.util
+            multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+        if self.__queue is not None:
+            self.__queue.put(record)
+            return
+        with self.__lock:
+            self.__buffer.append(record)
+            self.__buffered += len(message) + 32
+            if self.__buffered < self.__buffer_size and time.monotonic() - self.__last_flush < self.__flush_interval:
+                # The timer writes the message even if nothing else is logged, e.g. in an idle server.
+                if self.__timer is None:
+                    self.__timer = threading.Timer(self.__flush_interval, self.__flush_on_timer)
+                    self.__timer.daemon = True
+                    self.__timer.start()
+                return
+            # Written under the lock, so a flush by the timer can't write to the file at the same time, or first.
+            self.__write(self.__take_buffer())
+
+    def __flush_on_timer(self) -> None:
+        """
+        Private method run by the flush timer.
+        :return: None
+        """
+        with self.__lock:
+            self.__timer = None
+            records = self.__take_buffer()
+            self.__write(records)
+
+    def __take_buffer(self) -> list:
+        """
+        Private method to empty the buffer. Must be called with the lock held.
+        :return: list of records that were in the buffer
+        """
+        records = self.__buffer
+        self.__buffer = []
+        self.__buffered = 0
+        self.__last_flush = time.monotonic()
+        return records
+
+    def __write(self, records: list) -> None:
+        """
+        Private method to write records to the log file.
+        :param records: list of records
+        :return: None
+        """
+        if not records:
+            return
+        if self.__handle is None or self.__handle.closed:
+            self.__handle = open(self.__file, 'a', encoding='utf-8')
+        self.__handle.write(''.join(map(self.__format_record, records)))
+        self.__handle.flush()
+
+    def __start_thread(self) -> None:
+        """
+        Private method to start the background writer thread.
+        :return: None
+        """
+        self.__queue = queue.SimpleQueue()
+        self.__thread = threading.Thread(target=self.__run_thread, name='simple_logger', daemon=True)
+        self.__thread.start()
+
+    def __run_thread(self) -> None:
+        """
+        Private method run by the background writer thread. Collects records from the queue and writes them
+        in batches. An event in the queue is a request to flush, and to stop when the thread was detached by close().
+        :return: None
+        """
+        records = []
+        last_write = time.monotonic()
+        while True:
+            try:
+                record = self.__queue.get(timeout=self.__flush_interval)
+            except queue.Empty:
+                record = None
+            if record is not None and not isinstance(record, threading.Event):
+                records.append(record)
+                if len(records) < 1024 and time.monotonic() - last_write < self.__flush_interval:
+                    continue
+            with self.__lock:
+                self.__write(records)
+            records = []
+            last_write = time.monotonic()
+            if isinstance(record, threading.Event):
+                record.set()
+                if self.__thread is None:
+                    return
+
+    def __after_fork(self) -> None:
+        """
+        Private method run in a forked child process. Drops the records inherited from the parent
+        and starts a new writer thread, as threads are not copied by fork.
+        Workers of a process pool end with os._exit(), which skips atexit, so the records of the child
+        are flushed by a multiprocessing finalizer, registered by the first message of the child.
+        :return: None
+        """
+        self.__lock = threading.Lock()
+        self.__buffer = []
+        self.__buffered = 0
+        self.__timer = None
+        if self.__background and self.__thread is not None:
+            self.__start_thread()
+        self.__forked = True
+
+    def flush(self) -> None:
+        """
+        Writes all buffered messages to the log file.
+        :return: None
+        """
+        if self.__queue is not None and self.__thread is not None:
+            if threading.current_thread() is self.__thread:
+                return
+            done = threading.Event()
+            self.__queue.put(done)
+            done.wait()
+            return
+        with self.__lock:
+            records = self.__take_buffer()
+            self.__write(records)
+
+    def close(self) -> None:
+        """
+        Writes all buffered messages and closes the log file. Messages logged later open the file again.
+        :return: None
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if self.__thread is not None:
+            thread = self.__thread
+            self.__thread = None
+            done = threading.Event()
+            self.__queue.put(done)
+            thread.join()
+            self.__queue = None
+        else:
+            self.flush()
+        with self.__lock:
+            if self.__handle is not None and not self.__handle.closed:
+                self.__handle.close()
+
+    def debug(self, message: str, *args) -> None:
         """
         Logs a debug message to the file. Only logs if the level is 0.
-        :param message: log message
+        :param message: log message, formatted with the % operator when args are given
+        :param args: arguments for the message, only formatted when the message is logged
         :return: None
         """
         if self.__level == 0:
-            with open(self.__file, 'a') as f:
-                f.write(f'[{self.__get_short_time()}] [DEBUG]:\t{message}\n')
-                f.close()
+            self.__log(DEBUG, message, args)
 
-    def info(self, message: str) -> None:
+    def info(self, message: str, *args) -> None:
         """
         Logs an info message to the file. Only logs if the level 1 or lower.
-        :param message: log message
+        :param message: log message, formatted with the % operator when args are given
+        :param args: arguments for the message, only formatted when the message is logged
         :return: None
         """
         if self.__level <= 1:
-            with open(self.__file, 'a') as f:
-                f.write(f'[{self.__get_short_time()}] [INFO]:\t{message}\n')
-                f.close()
+            self.__log(INFO, message, args)
 
-    def warn(self, message: str) -> None:
+    def warn(self, message: str, *args) -> None:
         """
         Logs a warning message to the file. Only logs if the level is 2 or lower.
-        :param message: log message
+        :param message: log message, formatted with the % operator when args are given
+        :param args: arguments for the message, only formatted when the message is logged
         :return: None
         """
         if self.__level <= 2:
-            with open(self.__file, 'a') as f:
-                f.write(f'[{self.__get_short_time()}] [WARN]:\t{message}\n')
-                f.close()
+            self.__log(WARN, message, args)
 
-    def error(self, message: str) -> None:
+    def error(self, message: str, *args) -> None:
         """
         Logs an error message to the file. Only logs if the level is 3 or lower.
-        :param message: log message
+        :param message: log message, formatted with the % operator when args are given
+        :param args: arguments for the message, only formatted when the message is logged
         :return: None
         """
         if self.__level <= 3:
-            with open(self.__file, 'a') as f:
-                f.write(f'[{self.__get_short_time()}] [ERROR]:\t{message}\n')
-                f.close()
+            self.__log(ERROR, message, args)
 
-    def critical(self, message: str) -> None:
+    def critical(self, message: str, *args) -> None:
         """
         Logs a critical message to the file. Only logs if the level is 4 or lower.
-        :param message: log message
+        :param message: log message, formatted with the % operator when args are given
+        :param args: arguments for the message, only formatted when the message is logged
         :return: None
         """
         if self.__level <= 4:
-            with open(self.__file, 'a') as f:
-                f.write(f'[{self.__get_short_time()}] [CRITICAL]:\t{message}\n')
-                f.close()
+            self.__log(CRITICAL, message, args)
 
     def set_level(self, level: int = 1) -> None:
         """
@@ -137,11 +340,12 @@ class LOG:
             file = self.__filepath + filename
 
         try:
+            self.debug('Saving log file')
+            self.flush()
             with open(file, 'w') as f:
                 with open(self.__file, 'r') as r:
-                    self.debug('Saving log file')
                     f.write(r.read())
                     r.close()
                 f.close()
         except Exception as e:
-            self.error(f'Error while saving the log file: {e}')
\ No newline at end of file
+            self.error(f'Error while saving the log file: {e}')